@@ -1,6 +1,20 @@
-from typing import List, Optional
-import queue
+from typing import List, Optional, Tuple
+from array import array
+import mmap
 import sys
+import numpy as np
+
+GATE_AND = 0
+GATE_OR = 1
+GATE_XOR = 2
+GATE_NOT = 3
+
+# bit (a << 1 | b) of each entry is the output of the gate type on inputs a, b
+GATE_TRUTH_TABLES = [0b1000, 0b1110, 0b0110, 0b0011]
+
+
+def evaluate_gate(type_code: int, a: int, b: int) -> int:
+    return (GATE_TRUTH_TABLES[type_code] >> (a << 1 | b)) & 1
 
 
 class Wire:
@@ -18,6 +32,7 @@ class Gate:
     inputs: List[Wire]
     output: Wire
     index: int
+    type_code: Optional[int] = None
 
     def __init__(self) -> None:
         self.inputs = []
@@ -28,6 +43,8 @@ class Gate:
 
 
 class AndGate(Gate):
+    type_code = GATE_AND
+
     def __init__(self, w_a, w_b, w_c) -> None:
         self.inputs = [w_a, w_b]
         self.output = w_c
@@ -42,11 +59,213 @@ class AndGate(Gate):
         return input_bits[0] & input_bits[1]
 
 
+class CompactCircuit:
+    # flat array form of a Circuit, gates are stored in topological order and
+    # unary gates store their input in both gate_in_a and gate_in_b
+    n_wires: int
+    gate_types: array
+    gate_in_a: array
+    gate_in_b: array
+    gate_out: array
+    inputs: array
+    outputs: array
+    _levels: Optional[List[np.ndarray]]
+    _registers: Optional[Tuple[int, array, array, array, array, array]]
+    _buffer: Optional[mmap.mmap]
+
+    def __init__(
+        self,
+        n_wires: int,
+        gate_types: array,
+        gate_in_a: array,
+        gate_in_b: array,
+        gate_out: array,
+        inputs: array,
+        outputs: array,
+        buffer: Optional[mmap.mmap] = None,
+    ) -> None:
+        assert len(gate_types) == len(gate_in_a) == len(gate_in_b) == len(gate_out)
+        self.n_wires = n_wires
+        self.gate_types = gate_types
+        self.gate_in_a = gate_in_a
+        self.gate_in_b = gate_in_b
+        self.gate_out = gate_out
+        self.inputs = inputs
+        self.outputs = outputs
+        self._levels = None
+        self._registers = None
+        # memory map backing the arrays, see circuit_utils.formats.load_compact
+        self._buffer = buffer
+
+    def close(self) -> None:
+        if self._buffer is None:
+            return
+        for a in [
+            self.gate_types,
+            self.gate_in_a,
+            self.gate_in_b,
+            self.gate_out,
+            self.inputs,
+            self.outputs,
+        ]:
+            if isinstance(a, memoryview):
+                a.release()
+        self._buffer.close()
+        self._buffer = None
+
+    def __enter__(self) -> 'CompactCircuit':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def n_gates(self) -> int:
+        return len(self.gate_types)
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels())
+
+    def levels(self) -> List[np.ndarray]:
+        # gate indices grouped by level, gates of level k only read wires that
+        # are circuit inputs or outputs of gates in levels < k
+        if self._levels is None:
+            wire_level: List[int] = [0] * self.n_wires
+            gate_level = array('i', bytes(4 * self.n_gates))
+            for i, (a, b, c) in enumerate(
+                zip(self.gate_in_a, self.gate_in_b, self.gate_out)
+            ):
+                level = max(wire_level[a], wire_level[b])
+                gate_level[i] = level
+                wire_level[c] = level + 1
+            gate_level = np.frombuffer(gate_level, dtype=np.intc)
+            order = np.argsort(gate_level, kind='stable')
+            widths = np.bincount(gate_level)
+            self._levels = np.split(order, np.cumsum(widths)[:-1]) if len(order) else []
+        return self._levels
+
+    def level_widths(self) -> List[int]:
+        return [len(level) for level in self.levels()]
+
+    def registers(self) -> Tuple[int, array, array, array, array, array]:
+        # register allocation for evaluating the gates in order: a wire gets a
+        # slot when it is set and the slot is reused once its last reader has
+        # run, so the slots follow the width of the circuit rather than its size.
+        # returns the number of slots and the slots of gate_in_a, gate_in_b,
+        # gate_out, inputs and outputs
+        if self._registers is None:
+            n_gates = self.n_gates
+            last_use: List[int] = [-1] * self.n_wires
+            for i, (a, b) in enumerate(zip(self.gate_in_a, self.gate_in_b)):
+                last_use[a] = last_use[b] = i
+            for w in self.outputs:
+                last_use[w] = n_gates
+            slot: List[int] = [-1] * self.n_wires
+            free: List[int] = []
+            n_slots = 0
+
+            def allocate(w, i):
+                nonlocal n_slots
+                if free:
+                    slot[w] = free.pop()
+                else:
+                    slot[w] = n_slots
+                    n_slots += 1
+                if last_use[w] <= i:
+                    # never read
+                    free.append(slot[w])
+                return slot[w]
+
+            input_slots = array('i', [allocate(w, -1) for w in self.inputs])
+            slot_a = array('i', bytes(4 * n_gates))
+            slot_b = array('i', bytes(4 * n_gates))
+            slot_out = array('i', bytes(4 * n_gates))
+            for i, (a, b, c) in enumerate(
+                zip(self.gate_in_a, self.gate_in_b, self.gate_out)
+            ):
+                if slot[a] < 0 or slot[b] < 0:
+                    raise ValueError('gate reads an undriven wire')
+                slot_a[i], slot_b[i] = slot[a], slot[b]
+                if last_use[a] == i:
+                    free.append(slot[a])
+                if last_use[b] == i and b != a:
+                    free.append(slot[b])
+                slot_out[i] = allocate(c, i)
+            if any(slot[w] < 0 for w in self.outputs):
+                raise ValueError('output reads an undriven wire')
+            output_slots = array('i', [slot[w] for w in self.outputs])
+            self._registers = (
+                n_slots,
+                slot_a,
+                slot_b,
+                slot_out,
+                input_slots,
+                output_slots,
+            )
+        return self._registers
+
+    def evaluate(self, input_bits: List[int]):
+        assert len(self.inputs) == len(input_bits)
+        wire_ret: List[int] = [-1] * self.n_wires
+        for w, bit in zip(self.inputs, input_bits):
+            wire_ret[w] = bit
+        for t, a, b, c in zip(
+            self.gate_types, self.gate_in_a, self.gate_in_b, self.gate_out
+        ):
+            wire_ret[c] = (GATE_TRUTH_TABLES[t] >> (wire_ret[a] << 1 | wire_ret[b])) & 1
+        return [wire_ret[w] for w in self.outputs]
+
+    def evaluate_batch(self, inputs_matrix) -> np.ndarray:
+        # bit-sliced evaluation: bit j of every uint64 word on a wire belongs to
+        # the j-th input vector, so each gate is one bitwise op per 64 vectors
+        inputs_matrix = np.asarray(inputs_matrix, dtype=np.uint8)
+        batch, n_inputs = inputs_matrix.shape
+        assert n_inputs == len(self.inputs)
+        n_words = (batch + 63) // 64
+        packed = np.zeros((n_inputs, n_words * 8), dtype=np.uint8)
+        packed[:, : (batch + 7) // 8] = np.packbits(
+            inputs_matrix.T, axis=1, bitorder='little'
+        )
+        wire_ret = np.zeros((self.n_wires, n_words), dtype=np.uint64)
+        wire_ret[np.frombuffer(self.inputs, dtype=np.intc)] = packed.view(np.uint64)
+
+        ops = {
+            GATE_AND: np.bitwise_and,
+            GATE_OR: np.bitwise_or,
+            GATE_XOR: np.bitwise_xor,
+        }
+        gate_types = np.frombuffer(self.gate_types, dtype=np.uint8)
+        gate_in_a = np.frombuffer(self.gate_in_a, dtype=np.intc)
+        gate_in_b = np.frombuffer(self.gate_in_b, dtype=np.intc)
+        gate_out = np.frombuffer(self.gate_out, dtype=np.intc)
+        # gates of one level are independent, so each gate type in a level is
+        # evaluated by a single vectorised op
+        for level in self.levels():
+            types = gate_types[level]
+            for t in np.unique(types):
+                gates = level[types == t]
+                if t == GATE_NOT:
+                    wire_ret[gate_out[gates]] = ~wire_ret[gate_in_a[gates]]
+                else:
+                    wire_ret[gate_out[gates]] = ops[t](
+                        wire_ret[gate_in_a[gates]], wire_ret[gate_in_b[gates]]
+                    )
+
+        outputs = wire_ret[np.frombuffer(self.outputs, dtype=np.intc)]
+        return np.unpackbits(
+            outputs.view(np.uint8), axis=1, count=batch, bitorder='little'
+        ).T
+
+
 class Circuit:
     gates: List[Gate]
     wires: List[Wire]
     inputs: List[Wire]
     outputs: List[Wire]
+    _schedule: Optional[List[int]]
+    _levels: Optional[List[List[int]]]
+    _frozen: Optional[CompactCircuit]
 
     # inputs代表每个输入bit对应到的wire，默认前若干个是a的bit，后面的是b的bit，inputs大小必须和input_bits大小相等（编号可以任意）
 
@@ -55,8 +274,14 @@ class Circuit:
         self.wires = []
         self.inputs = []
         self.outputs = []
+        self._schedule = None
+        self._levels = None
+        self._frozen = None
 
     def add_gate(self, g: Gate) -> int:
+        self._schedule = None
+        self._levels = None
+        self._frozen = None
         g.index = len(self.gates)
         self.gates.append(g)
         for w in g.inputs:
@@ -65,6 +290,7 @@ class Circuit:
         return g.index
 
     def add_wire(self, w: Wire) -> int:
+        self._frozen = None
         w.index = len(self.wires)
         self.wires.append(w)
         return w.index
@@ -72,35 +298,97 @@ class Circuit:
     def extend_wires(self, wires: List[Wire]) -> List[int]:
         return [self.add_wire(w) for w in wires]
 
-    def evaluate(self, input_bits: List[int]):
+    def schedule(self) -> List[int]:
+        # topological order of gate indices, cached until the next add_gate
+        if self._schedule is None:
+            in_deg: List[int] = [
+                sum(w.input is not None for w in g.inputs) for g in self.gates
+            ]
+            order = [g.index for g in self.gates if in_deg[g.index] == 0]
+            for gate_index in order:
+                for out_gate in self.gates[gate_index].output.outputs:
+                    if out_gate is not None:
+                        in_deg[out_gate.index] -= 1
+                        if in_deg[out_gate.index] == 0:
+                            order.append(out_gate.index)
+            self._schedule = order
+        return self._schedule
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels())
 
+    def levels(self) -> List[List[int]]:
+        # gate indices grouped by level, gates of level k only read wires that
+        # are not driven by a gate or are outputs of gates in levels < k
+        if self._levels is None:
+            gate_level: List[int] = [0] * len(self.gates)
+            levels: List[List[int]] = []
+            for gate_index in self.schedule():
+                level = max(
+                    (
+                        gate_level[w.input.index] + 1
+                        for w in self.gates[gate_index].inputs
+                        if w.input is not None
+                    ),
+                    default=0,
+                )
+                gate_level[gate_index] = level
+                if level == len(levels):
+                    levels.append([])
+                levels[level].append(gate_index)
+            self._levels = levels
+        return self._levels
+
+    def level_widths(self) -> List[int]:
+        return [len(level) for level in self.levels()]
+
+    def evaluate(self, input_bits: List[int]):
         assert len(self.inputs) == len(input_bits)
-        n = len(self.gates)
-        m = len(self.wires)
-        in_deg: List[int] = [0] * n
-        wire_ret: List[int] = [-1] * m
-        for wire in self.wires:
-            for out_gate in wire.outputs:
-                if out_gate is not None:
-                    in_deg[out_gate.index] += 1
-        q = queue.Queue()
-        for i in range(len(input_bits)):
-            wire_ret[self.inputs[i].index] = input_bits[i]
-            q.put(self.inputs[i])
-
-        while not q.empty():
-            wire = q.get()
-            for out_gate in wire.outputs:
-                if out_gate is not None:
-                    in_deg[out_gate.index] -= 1
-                    if in_deg[out_gate.index] == 0:
-                        wire_ret[out_gate.output.index] = out_gate.evaluate(
-                            [
-                                wire_ret[input_wire.index]
-                                for input_wire in out_gate.inputs
-                            ]
-                        )
-                        q.put(out_gate.output)
-        output_bits = [wire_ret[output_wire.index] for output_wire in self.outputs]
-
-        return output_bits
+        wire_ret: List[int] = [-1] * len(self.wires)
+        for w, bit in zip(self.inputs, input_bits):
+            wire_ret[w.index] = bit
+        for gate_index in self.schedule():
+            gate = self.gates[gate_index]
+            wire_ret[gate.output.index] = gate.evaluate(
+                [wire_ret[input_wire.index] for input_wire in gate.inputs]
+            )
+        return [wire_ret[output_wire.index] for output_wire in self.outputs]
+
+    def evaluate_batch(self, inputs_matrix) -> np.ndarray:
+        return self.freeze().evaluate_batch(inputs_matrix)
+
+    def freeze(self) -> CompactCircuit:
+        # cached until the next add_gate/add_wire, inputs and outputs are assigned
+        # directly by callers so they are compared on every call
+        inputs = array('i', [w.index for w in self.inputs])
+        outputs = array('i', [w.index for w in self.outputs])
+        if (
+            self._frozen is not None
+            and self._frozen.inputs == inputs
+            and self._frozen.outputs == outputs
+        ):
+            return self._frozen
+
+        order = [self.gates[i] for i in self.schedule()]
+
+        gate_types = array('B', bytes(len(order)))
+        gate_in_a = array('i', bytes(4 * len(order)))
+        gate_in_b = array('i', bytes(4 * len(order)))
+        gate_out = array('i', bytes(4 * len(order)))
+        for i, g in enumerate(order):
+            assert g.type_code is not None, f'gate {g} has no type code'
+            gate_types[i] = g.type_code
+            gate_in_a[i] = g.inputs[0].index
+            gate_in_b[i] = g.inputs[-1].index
+            gate_out[i] = g.output.index
+        self._frozen = CompactCircuit(
+            len(self.wires),
+            gate_types,
+            gate_in_a,
+            gate_in_b,
+            gate_out,
+            inputs,
+            outputs,
+        )
+        return self._frozen
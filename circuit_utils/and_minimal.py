@@ -0,0 +1,275 @@
+from typing import List
+from circuit import Circuit, Wire
+from .gates import And, Xor, Or, Not
+
+# Drop-in replacement for circuit_utils.modules that minimises non-XOR gates,
+# which are the only gates that cost a garbled table under free-XOR. Every
+# module keeps the constructor of its counterpart in circuit_utils.modules.
+
+
+def _wire(circuit: Circuit, w: Wire = None) -> Wire:
+    if w is None:
+        w = Wire()
+        circuit.add_wire(w)
+    return w
+
+
+def _wires(circuit: Circuit, bit_length: int, wires: List[Wire] = None) -> List[Wire]:
+    if wires is None:
+        wires = [Wire() for _ in range(bit_length)]
+        circuit.extend_wires(wires)
+    else:
+        assert len(wires) == bit_length
+    return wires
+
+
+def _xor(circuit: Circuit, a: Wire, b: Wire, out: Wire = None) -> Wire:
+    out = _wire(circuit, out)
+    circuit.add_gate(Xor(a, b, out))
+    return out
+
+
+def _and(circuit: Circuit, a: Wire, b: Wire, out: Wire = None) -> Wire:
+    out = _wire(circuit, out)
+    circuit.add_gate(And(a, b, out))
+    return out
+
+
+def _not(circuit: Circuit, a: Wire, out: Wire = None) -> Wire:
+    out = _wire(circuit, out)
+    circuit.add_gate(Not(a, out))
+    return out
+
+
+def _or(circuit: Circuit, a: Wire, b: Wire, out: Wire = None) -> Wire:
+    out = _wire(circuit, out)
+    circuit.add_gate(Or(a, b, out))
+    return out
+
+
+def _copy(circuit: Circuit, a: Wire, out: Wire) -> Wire:
+    # two free NOTs, removed again by circuit_utils.passes.hash_gates
+    return _not(circuit, _not(circuit, a), out)
+
+
+def _majority(circuit: Circuit, a: Wire, b: Wire, c: Wire, out: Wire = None) -> Wire:
+    # maj(a, b, c) = ((a ^ c) & (b ^ c)) ^ c, one AND
+    t = _and(circuit, _xor(circuit, a, c), _xor(circuit, b, c))
+    return _xor(circuit, t, c, out)
+
+
+def _borrows(circuit: Circuit, in_0: List[Wire], in_1: List[Wire], n: int):
+    # borrows[i] of in_0 - in_1 for i in 1..n, borrow_{i+1} = maj(~a_i, b_i, borrow_i)
+    # with borrow_0 = 0, so the first one is ~a_0 & b_0
+    if n == 0:
+        return [None]
+    borrows = [None, _and(circuit, _not(circuit, in_0[0]), in_1[0])]
+    for i in range(1, n):
+        borrows.append(_majority(circuit, _not(circuit, in_0[i]), in_1[i], borrows[i]))
+    return borrows
+
+
+class Select:
+    def __init__(
+        self,
+        circuit: Circuit,
+        in_0: Wire = None,
+        in_1: Wire = None,
+        index: Wire = None,
+        out: Wire = None,
+    ) -> None:
+        self.in_0 = _wire(circuit, in_0)
+        self.in_1 = _wire(circuit, in_1)
+        self.index = _wire(circuit, index)
+        self.out = _wire(circuit, out)
+
+        # out = in_0 ^ (index & (in_0 ^ in_1))
+        d = _xor(circuit, self.in_0, self.in_1)
+        t = _and(circuit, self.index, d)
+        _xor(circuit, self.in_0, t, self.out)
+
+
+class HalfAdder:
+    def __init__(
+        self,
+        circuit: Circuit,
+        in_0: Wire = None,
+        in_1: Wire = None,
+        out: Wire = None,
+        carry: Wire = None,
+    ) -> None:
+        self.in_0 = _wire(circuit, in_0)
+        self.in_1 = _wire(circuit, in_1)
+        self.out = _wire(circuit, out)
+        self.carry = _wire(circuit, carry)
+
+        _xor(circuit, self.in_0, self.in_1, self.out)
+        _and(circuit, self.in_0, self.in_1, self.carry)
+
+
+class FullAdder:
+    def __init__(
+        self,
+        circuit: Circuit,
+        in_0: Wire = None,
+        in_1: Wire = None,
+        in_carry: Wire = None,
+        out: Wire = None,
+        carry: Wire = None,
+    ) -> None:
+        self.in_0 = _wire(circuit, in_0)
+        self.in_1 = _wire(circuit, in_1)
+        self.in_carry = _wire(circuit, in_carry)
+        self.out = _wire(circuit, out)
+        self.carry = _wire(circuit, carry)
+
+        t = _xor(circuit, self.in_0, self.in_1)
+        _xor(circuit, t, self.in_carry, self.out)
+        _majority(circuit, self.in_0, self.in_1, self.in_carry, self.carry)
+
+
+class Add:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        in_0: List[Wire] = None,
+        in_1: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.in_1 = in_1 = _wires(circuit, bit_length, in_1)
+        self.out = out = _wires(circuit, bit_length, out)
+
+        # the carry out of the top bit is dropped, so n - 1 ANDs
+        _xor(circuit, in_0[0], in_1[0], out[0])
+        if bit_length > 1:
+            carry = _and(circuit, in_0[0], in_1[0])
+        for i in range(1, bit_length):
+            t = _xor(circuit, in_0[i], in_1[i])
+            _xor(circuit, t, carry, out[i])
+            if i + 1 < bit_length:
+                carry = _majority(circuit, in_0[i], in_1[i], carry)
+
+
+class Negate:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        one: Wire,
+        in_0: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.out = out = _wires(circuit, bit_length, out)
+
+        # -x keeps the lowest set bit and flips every bit above it, so
+        # out_i = x_i ^ (x_0 | ... | x_{i-1}) with n - 2 ORs. one is not needed.
+        _copy(circuit, in_0[0], out[0])
+        if bit_length > 1:
+            seen = in_0[0]
+        for i in range(1, bit_length):
+            _xor(circuit, in_0[i], seen, out[i])
+            if i + 1 < bit_length:
+                seen = _or(circuit, seen, in_0[i])
+
+
+class Subtract:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        one: Wire,
+        in_0: List[Wire] = None,
+        in_1: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.in_1 = in_1 = _wires(circuit, bit_length, in_1)
+        self.out = out = _wires(circuit, bit_length, out)
+
+        # the borrow out of the top bit is dropped, so n - 1 ANDs
+        borrows = _borrows(circuit, in_0, in_1, bit_length - 1)
+        _xor(circuit, in_0[0], in_1[0], out[0])
+        for i in range(1, bit_length):
+            t = _xor(circuit, in_0[i], in_1[i])
+            _xor(circuit, t, borrows[i], out[i])
+
+
+class Lt:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        one: Wire,
+        in_0: List[Wire] = None,
+        in_1: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.in_1 = in_1 = _wires(circuit, bit_length, in_1)
+        self.out = out = _wires(circuit, 1, out)
+
+        # signed comparison: the sign of in_0 - in_1 computed on bit_length + 1
+        # bits, only the borrow chain is needed, so n ANDs
+        borrows = _borrows(circuit, in_0, in_1, bit_length)
+        t = _xor(circuit, in_0[-1], in_1[-1])
+        _xor(circuit, t, borrows[bit_length], out[0])
+
+
+class Le:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        one: Wire,
+        in_0: List[Wire] = None,
+        in_1: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.in_1 = in_1 = _wires(circuit, bit_length, in_1)
+        self.out = out = _wires(circuit, 1, out)
+
+        lt = Lt(circuit, bit_length, one, in_1, in_0)
+        _not(circuit, lt.out[0], out[0])
+
+
+class Eq:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        one: Wire,
+        in_0: List[Wire] = None,
+        in_1: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        self.in_1 = in_1 = _wires(circuit, bit_length, in_1)
+        self.out = out = _wires(circuit, 1, out)
+
+        diff = [_xor(circuit, a, b) for a, b in zip(in_0, in_1)]
+        to_bool = ToBool(circuit, bit_length, diff)
+        _not(circuit, to_bool.out[0], out[0])
+
+
+class ToBool:
+    def __init__(
+        self,
+        circuit: Circuit,
+        bit_length: int,
+        in_0: List[Wire] = None,
+        out: List[Wire] = None,
+    ) -> None:
+        self.in_0 = in_0 = _wires(circuit, bit_length, in_0)
+        n = len(in_0)
+        if out is None:
+            out = _wires(circuit, 1) if n > 1 else in_0
+        self.out = out
+
+        if n > 1:
+            t1 = ToBool(circuit, n // 2, in_0[: n // 2])
+            t2 = ToBool(circuit, n - n // 2, in_0[n // 2 :])
+            circuit.add_gate(Or(t1.out[0], t2.out[0], self.out[0]))
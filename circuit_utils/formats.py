@@ -0,0 +1,209 @@
+from typing import List, Optional, TextIO, Union
+from array import array
+import mmap
+import struct
+import sys
+from circuit import (
+    Circuit,
+    CompactCircuit,
+    GATE_AND,
+    GATE_OR,
+    GATE_XOR,
+    GATE_NOT,
+)
+
+# Bristol Fashion
+# https://homes.esat.kuleuven.be/~nsmart/MPC/
+
+
+def dump_bristol(
+    circuit: Union[Circuit, CompactCircuit],
+    f: TextIO,
+    input_sizes: Optional[List[int]] = None,
+    output_sizes: Optional[List[int]] = None,
+):
+    # Bristol Fashion numbers the inputs first and the outputs last, so wires are
+    # renumbered. OR is written as XOR(XOR(a, b), AND(a, b)) and outputs that are
+    # inputs or repeated are copied with EQW.
+    if isinstance(circuit, Circuit):
+        circuit = circuit.freeze()
+    n_inputs, n_outputs = len(circuit.inputs), len(circuit.outputs)
+    if input_sizes is None:
+        input_sizes = [n_inputs]
+    if output_sizes is None:
+        output_sizes = [n_outputs]
+    assert sum(input_sizes) == n_inputs and sum(output_sizes) == n_outputs
+    assert len(set(circuit.inputs)) == n_inputs, 'inputs should be distinct'
+
+    mapping = {w: i for i, w in enumerate(circuit.inputs)}
+    driven = set(circuit.gate_out)
+    n_internal = 2 * sum(t == GATE_OR for t in circuit.gate_types)
+    output_slot = {}
+    for j, w in enumerate(circuit.outputs):
+        if w in driven and w not in output_slot:
+            output_slot[w] = j
+    n_internal += len(driven) - len(output_slot)
+    n_wires = n_inputs + n_internal + n_outputs
+    for w, j in output_slot.items():
+        mapping[w] = n_wires - n_outputs + j
+    next_wire = n_inputs
+
+    def new_wire():
+        nonlocal next_wire
+        next_wire += 1
+        return next_wire - 1
+
+    lines = []
+    for t, a, b, c in zip(
+        circuit.gate_types, circuit.gate_in_a, circuit.gate_in_b, circuit.gate_out
+    ):
+        if a not in mapping or b not in mapping:
+            raise ValueError('gate reads an undriven wire')
+        a, b = mapping[a], mapping[b]
+        if c not in mapping:
+            mapping[c] = new_wire()
+        c = mapping[c]
+        if t == GATE_AND:
+            lines.append(f'2 1 {a} {b} {c} AND')
+        elif t == GATE_XOR:
+            lines.append(f'2 1 {a} {b} {c} XOR')
+        elif t == GATE_NOT:
+            lines.append(f'1 1 {a} {c} INV')
+        elif t == GATE_OR:
+            t1, t2 = new_wire(), new_wire()
+            lines.append(f'2 1 {a} {b} {t1} XOR')
+            lines.append(f'2 1 {a} {b} {t2} AND')
+            lines.append(f'2 1 {t1} {t2} {c} XOR')
+        else:
+            raise ValueError(f'unsupported gate type {t}')
+    for j, w in enumerate(circuit.outputs):
+        if w not in mapping:
+            raise ValueError('output reads an undriven wire')
+        if output_slot.get(w) != j:
+            lines.append(f'1 1 {mapping[w]} {n_wires - n_outputs + j} EQW')
+
+    f.write(f'{len(lines)} {n_wires}\n')
+    f.write(' '.join(map(str, [len(input_sizes)] + input_sizes)) + '\n')
+    f.write(' '.join(map(str, [len(output_sizes)] + output_sizes)) + '\n')
+    f.write('\n')
+    for line in lines:
+        f.write(line + '\n')
+
+
+def load_bristol(f: TextIO) -> CompactCircuit:
+    tokens = [line.split() for line in f]
+    tokens = [line for line in tokens if line]
+    n_gates, n_wires = map(int, tokens[0])
+    n_inputs = sum(map(int, tokens[1][1:]))
+    n_outputs = sum(map(int, tokens[2][1:]))
+    # EQW gates are resolved by aliasing their output to their input wire
+    alias = list(range(n_wires))
+
+    gate_types = array('B')
+    gate_in_a = array('i')
+    gate_in_b = array('i')
+    gate_out = array('i')
+
+    def add(t, a, b, c):
+        gate_types.append(t)
+        gate_in_a.append(alias[a])
+        gate_in_b.append(alias[b])
+        gate_out.append(c)
+
+    assert len(tokens) - 3 == n_gates, 'gate count mismatch'
+    for line in tokens[3:]:
+        n_in, n_out = int(line[0]), int(line[1])
+        wires = list(map(int, line[2 : 2 + n_in + n_out]))
+        op = line[2 + n_in + n_out]
+        if op == 'AND':
+            add(GATE_AND, *wires)
+        elif op == 'XOR':
+            add(GATE_XOR, *wires)
+        elif op == 'INV':
+            add(GATE_NOT, wires[0], wires[0], wires[1])
+        elif op == 'EQW':
+            alias[wires[1]] = alias[wires[0]]
+        elif op == 'MAND':
+            k = n_out
+            for i in range(k):
+                add(GATE_AND, wires[i], wires[k + i], wires[2 * k + i])
+        else:
+            raise ValueError(f'unsupported gate {op}')
+
+    return CompactCircuit(
+        n_wires,
+        gate_types,
+        gate_in_a,
+        gate_in_b,
+        gate_out,
+        array('i', range(n_inputs)),
+        array('i', [alias[w] for w in range(n_wires - n_outputs, n_wires)]),
+    )
+
+
+# binary format: a little-endian header followed by the int32 arrays gate_in_a,
+# gate_in_b, gate_out, inputs, outputs and finally the uint8 gate_types
+_MAGIC = b'MPCC'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIIIII')
+
+
+def save_compact(circuit: Union[Circuit, CompactCircuit], path: str):
+    if isinstance(circuit, Circuit):
+        circuit = circuit.freeze()
+    with open(path, 'wb') as f:
+        f.write(
+            _HEADER.pack(
+                _MAGIC,
+                _VERSION,
+                circuit.n_wires,
+                circuit.n_gates,
+                len(circuit.inputs),
+                len(circuit.outputs),
+            )
+        )
+        for a in [
+            circuit.gate_in_a,
+            circuit.gate_in_b,
+            circuit.gate_out,
+            circuit.inputs,
+            circuit.outputs,
+        ]:
+            a = array('i', a)
+            if sys.byteorder != 'little':
+                a.byteswap()
+            f.write(a.tobytes())
+        f.write(bytes(circuit.gate_types))
+
+
+def load_compact(path: str) -> CompactCircuit:
+    # the arrays of the returned circuit are views into a read-only memory map,
+    # which is released by CompactCircuit.close() or by using it as a context manager
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buf)
+    magic, version, n_wires, n_gates, n_inputs, n_outputs = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f'{path} is not a compact circuit file')
+    offset = _HEADER.size
+
+    def take(n, fmt):
+        nonlocal offset
+        size = struct.calcsize(fmt)
+        a = view[offset : offset + n * size].cast(fmt)
+        offset += n * size
+        if size > 1 and sys.byteorder != 'little':
+            a = array(fmt, a)
+            a.byteswap()
+        return a
+
+    gate_in_a = take(n_gates, 'i')
+    gate_in_b = take(n_gates, 'i')
+    gate_out = take(n_gates, 'i')
+    inputs = take(n_inputs, 'i')
+    outputs = take(n_outputs, 'i')
+    gate_types = take(n_gates, 'B')
+    view.release()
+    return CompactCircuit(
+        n_wires, gate_types, gate_in_a, gate_in_b, gate_out, inputs, outputs, buf
+    )
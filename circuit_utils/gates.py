@@ -1,11 +1,13 @@
 from typing import List
-from circuit import Gate, Wire
+from circuit import Gate, Wire, GATE_AND, GATE_OR, GATE_XOR, GATE_NOT
 
 
 class Not(Gate):
+    type_code = GATE_NOT
+
     def __init__(self, input: Wire, output: Wire) -> None:
         super().__init__()
-        self.inputs = [input, input]
+        self.inputs = [input]
         self.output = output
 
     def evaluate(self, input_bits: List[int]) -> int:
@@ -13,6 +15,8 @@ class Not(Gate):
 
 
 class And(Gate):
+    type_code = GATE_AND
+
     def __init__(self, in_0: Wire, in_1: Wire, out: Wire) -> None:
         super().__init__()
         self.inputs = [in_0, in_1]
@@ -23,6 +27,8 @@ class And(Gate):
 
 
 class Or(Gate):
+    type_code = GATE_OR
+
     def __init__(self, in_0: Wire, in_1: Wire, out: Wire) -> None:
         super().__init__()
         self.inputs = [in_0, in_1]
@@ -33,6 +39,8 @@ class Or(Gate):
 
 
 class Xor(Gate):
+    type_code = GATE_XOR
+
     def __init__(self, in_0: Wire, in_1: Wire, out: Wire) -> None:
         super().__init__()
         self.inputs = [in_0, in_1]
@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional, Tuple, Union
+from array import array
+from circuit import Circuit, CompactCircuit, GATE_NOT, evaluate_gate
+
+# every pass maps a circuit to an equivalent CompactCircuit with the same
+# inputs, wire indices of surviving gates are kept
+
+_ZERO = -1
+_ONE = -2
+
+
+def _rebuild(
+    circuit: CompactCircuit,
+    gates: List[Tuple[int, int, int, int]],
+    outputs: List[int],
+    n_wires: Optional[int] = None,
+) -> CompactCircuit:
+    return CompactCircuit(
+        circuit.n_wires if n_wires is None else n_wires,
+        array('B', [g[0] for g in gates]),
+        array('i', [g[1] for g in gates]),
+        array('i', [g[2] for g in gates]),
+        array('i', [g[3] for g in gates]),
+        array('i', circuit.inputs),
+        array('i', outputs),
+    )
+
+
+def _gates(circuit: CompactCircuit):
+    return zip(
+        circuit.gate_types, circuit.gate_in_a, circuit.gate_in_b, circuit.gate_out
+    )
+
+
+def fold_constants(
+    circuit: Union[Circuit, CompactCircuit], constants: Dict[int, int]
+) -> CompactCircuit:
+    # constants maps wire indices (usually the zero/one inputs) to their bit
+    if isinstance(circuit, Circuit):
+        circuit = circuit.freeze()
+    resolved = list(range(circuit.n_wires))
+    for w, v in constants.items():
+        resolved[w] = _ONE if v else _ZERO
+
+    gates = []
+    for t, a, b, c in _gates(circuit):
+        a, b = resolved[a], resolved[b]
+        if a < 0 and b < 0:
+            v = evaluate_gate(t, int(a == _ONE), int(b == _ONE))
+            resolved[c] = _ONE if v else _ZERO
+        elif t == GATE_NOT:
+            gates.append((t, a, a, c))
+        elif a < 0 or b < 0:
+            # binary gates are symmetric, so the constant is taken as input a and
+            # the gate reduces to a constant, a copy or a negation of b
+            if b < 0:
+                a, b = b, a
+            r0 = evaluate_gate(t, int(a == _ONE), 0)
+            r1 = evaluate_gate(t, int(a == _ONE), 1)
+            if r0 == r1:
+                resolved[c] = _ONE if r0 else _ZERO
+            elif r1:
+                resolved[c] = b
+            else:
+                gates.append((GATE_NOT, b, b, c))
+        else:
+            gates.append((t, a, b, c))
+
+    # outputs folded to a constant read a constant wire, negating the other one
+    # if no wire carries the needed bit
+    n_wires = circuit.n_wires
+    const_wires = {v: w for w, v in constants.items()}
+    outputs = []
+    for w in circuit.outputs:
+        w = resolved[w]
+        if w < 0:
+            v = int(w == _ONE)
+            if v not in const_wires:
+                gates.append(
+                    (GATE_NOT, const_wires[v ^ 1], const_wires[v ^ 1], n_wires)
+                )
+                const_wires[v] = n_wires
+                n_wires += 1
+            w = const_wires[v]
+        outputs.append(w)
+    return _rebuild(circuit, gates, outputs, n_wires)
+
+
+def hash_gates(circuit: Union[Circuit, CompactCircuit]) -> CompactCircuit:
+    # structural hashing: merges gates with the same type and inputs and removes
+    # double negations
+    if isinstance(circuit, Circuit):
+        circuit = circuit.freeze()
+    resolved = list(range(circuit.n_wires))
+    table: Dict[Tuple[int, int, int], int] = {}
+    negation_of: Dict[int, int] = {}
+
+    gates = []
+    for t, a, b, c in _gates(circuit):
+        a, b = resolved[a], resolved[b]
+        if t == GATE_NOT and a in negation_of:
+            resolved[c] = negation_of[a]
+            continue
+        key = (t, min(a, b), max(a, b))
+        if key in table:
+            resolved[c] = table[key]
+            continue
+        table[key] = c
+        if t == GATE_NOT:
+            negation_of[c] = a
+        gates.append((t, a, b, c))
+    return _rebuild(circuit, gates, [resolved[w] for w in circuit.outputs])
+
+
+def eliminate_dead_gates(circuit: Union[Circuit, CompactCircuit]) -> CompactCircuit:
+    # removes gates whose output cannot reach circuit.outputs
+    if isinstance(circuit, Circuit):
+        circuit = circuit.freeze()
+    live = set(circuit.outputs)
+    gates = []
+    for t, a, b, c in reversed(list(_gates(circuit))):
+        if c in live:
+            live.add(a)
+            live.add(b)
+            gates.append((t, a, b, c))
+    gates.reverse()
+    return _rebuild(circuit, gates, list(circuit.outputs))
+
+
+def optimize(
+    circuit: Union[Circuit, CompactCircuit],
+    constants: Optional[Dict[int, int]] = None,
+) -> CompactCircuit:
+    if constants:
+        circuit = fold_constants(circuit, constants)
+    circuit = hash_gates(circuit)
+    return eliminate_dead_gates(circuit)
@@ -0,0 +1,194 @@
+from typing import Any, Tuple, Union
+import socket
+import struct
+from .main import Sender, Receiver
+
+# two-party transport over TCP or a Unix domain socket, so alice and bob can run
+# in separate processes or machines. Every message is a frame of an 8-byte
+# little-endian length followed by its encoding below. Both ends send their id
+# in a first frame.
+#
+# encoding: one tag byte then
+#   N  None          T/F  True/False
+#   i  int64         I    uint32 length, signed little-endian int
+#   b  bytes         s    str, both as uint32 length then the data
+#   l  list          t    tuple, both as uint32 count then the items
+#   L  list of ints, uint32 count and uint32 width then the fixed-width ints
+
+_LENGTH = struct.Struct('<Q')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_U32_PAIR = struct.Struct('<II')
+
+Address = Union[Tuple[str, int], str]
+
+
+def _encode(msg, out: bytearray):
+    if msg is None:
+        out += b'N'
+    elif msg is True or msg is False:
+        out += b'T' if msg else b'F'
+    elif isinstance(msg, int):
+        if -(1 << 63) <= msg < 1 << 63:
+            out += b'i' + _I64.pack(msg)
+        else:
+            n = msg.bit_length() // 8 + 1
+            out += b'I' + _U32.pack(n)
+            out += msg.to_bytes(n, 'little', signed=True)
+    elif isinstance(msg, (bytes, bytearray, memoryview)):
+        out += b'b' + _U32.pack(len(msg))
+        out += msg
+    elif isinstance(msg, str):
+        data = msg.encode()
+        out += b's' + _U32.pack(len(data))
+        out += data
+    elif isinstance(msg, list) and msg and all(type(x) is int for x in msg):
+        width = max(x.bit_length() for x in msg) // 8 + 1
+        out += b'L' + _U32_PAIR.pack(len(msg), width)
+        for x in msg:
+            out += x.to_bytes(width, 'little', signed=True)
+    elif isinstance(msg, (list, tuple)):
+        out += (b'l' if isinstance(msg, list) else b't') + _U32.pack(len(msg))
+        for x in msg:
+            _encode(x, out)
+    else:
+        raise TypeError(f'cannot encode {type(msg).__name__}')
+
+
+def _decode(buf: memoryview, offset: int) -> Tuple[Any, int]:
+    tag = buf[offset : offset + 1].tobytes()
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag in [b'T', b'F']:
+        return tag == b'T', offset
+    if tag == b'i':
+        return _I64.unpack_from(buf, offset)[0], offset + 8
+    if tag in [b'I', b'b', b's']:
+        (n,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        data = buf[offset : offset + n]
+        if tag == b'I':
+            return int.from_bytes(data, 'little', signed=True), offset + n
+        if tag == b'b':
+            return data.tobytes(), offset + n
+        return str(data, 'utf-8'), offset + n
+    if tag == b'L':
+        n, width = _U32_PAIR.unpack_from(buf, offset)
+        offset += 8
+        data = buf[offset : offset + n * width].tobytes()
+        ret = [
+            int.from_bytes(data[k : k + width], 'little', signed=True)
+            for k in range(0, n * width, width)
+        ]
+        return ret, offset + n * width
+    if tag in [b'l', b't']:
+        (n,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        ret = []
+        for _ in range(n):
+            x, offset = _decode(buf, offset)
+            ret.append(x)
+        return (ret if tag == b'l' else tuple(ret)), offset
+    raise ValueError(f'unknown tag {tag!r}')
+
+
+def encode(msg) -> bytes:
+    out = bytearray()
+    _encode(msg, out)
+    return bytes(out)
+
+
+def decode(data: bytes):
+    msg, offset = _decode(memoryview(data), 0)
+    if offset != len(data):
+        raise ValueError('trailing data after message')
+    return msg
+
+
+class SocketSender(Sender):
+    def __init__(self, id, peer_id, sock: socket.socket) -> None:
+        self.id = id
+        self.peer_id = peer_id
+        self.sock = sock
+
+    def send(self, id, msg):
+        assert id == self.peer_id, f'agent with id {id} not found'
+        # the frame is built in one buffer and written at once, Nagle is off
+        frame = bytearray(_LENGTH.size)
+        _encode(msg, frame)
+        _LENGTH.pack_into(frame, 0, len(frame) - _LENGTH.size)
+        self.sock.sendall(frame)
+
+    def close(self):
+        # the receiver's stream keeps the socket open, shutdown ends the
+        # connection for the peer
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class SocketReceiver(Receiver):
+    def __init__(self, id, peer_id, sock: socket.socket, buffer_size=1 << 16) -> None:
+        self.id = id
+        self.peer_id = peer_id
+        self.stream = sock.makefile('rb', buffering=buffer_size)
+
+    def _read(self, n: int) -> bytes:
+        data = self.stream.read(n)
+        if len(data) != n:
+            raise ConnectionError('connection closed by peer')
+        return data
+
+    def receive(self):
+        (n,) = _LENGTH.unpack(self._read(_LENGTH.size))
+        return self.peer_id, decode(self._read(n))
+
+    def close(self):
+        self.stream.close()
+
+
+def _family(address: Address) -> int:
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+def _setup(id, sock: socket.socket) -> Tuple[SocketSender, SocketReceiver]:
+    if sock.family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sender = SocketSender(id, None, sock)
+    receiver = SocketReceiver(id, None, sock)
+    sender.send(None, id)
+    _, peer_id = receiver.receive()
+    sender.peer_id = receiver.peer_id = peer_id
+    return sender, receiver
+
+
+def listen(address: Address, backlog: int = 1) -> socket.socket:
+    # address is (host, port) for TCP, port 0 picks a free one, or a path for
+    # a Unix domain socket
+    server = socket.socket(_family(address), socket.SOCK_STREAM)
+    if server.family == socket.AF_INET:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(address)
+    server.listen(backlog)
+    return server
+
+
+def accept(id, server: socket.socket) -> Tuple[SocketSender, SocketReceiver]:
+    sock, _ = server.accept()
+    return _setup(id, sock)
+
+
+def connect(
+    id, address: Address, timeout: float = None
+) -> Tuple[SocketSender, SocketReceiver]:
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    else:
+        sock = socket.create_connection(address, timeout)
+    sock.settimeout(None)
+    return _setup(id, sock)
@@ -1,9 +1,10 @@
+from types import ModuleType
 from typing import Dict, List, Union
 import sys
 import ast
 from circuit import Circuit, Wire
 from circuit_utils import int2bits, bits2int
-from circuit_utils.modules import Add, Subtract, Lt, Le, Eq, ToBool, Select
+import circuit_utils.modules
 
 
 class ASTCompiler:
@@ -11,10 +12,17 @@ class ASTCompiler:
     zero: Wire
     one: Wire
     circuit: Circuit
+    modules: ModuleType
 
-    def __init__(self):
+    def __init__(self, modules: ModuleType = circuit_utils.modules):
+        # modules is circuit_utils.modules or circuit_utils.and_minimal
         self.vars = {}
         self.default_bit_length = 64
+        self.modules = modules
+
+    def constant_wires(self) -> Dict[int, int]:
+        # wire indices of the zero and one inputs, for circuit_utils.passes
+        return {self.zero.index: 0, self.one.index: 1}
 
     def create_variable(self, bit_length: int) -> List[Wire]:
         result = []
@@ -52,28 +60,34 @@ class ASTCompiler:
         ), f'line {expr.lineno}: operands should have the same bit length. got: {len(operands[0])} {len(operands[1])}'
         bit_length = len(operands[0])
         if isinstance(stmt.op, ast.Add):
-            adder = Add(self.circuit, bit_length, operands[0], operands[1])
+            adder = self.modules.Add(self.circuit, bit_length, operands[0], operands[1])
             return adder.out
         elif isinstance(stmt.op, ast.Sub):
-            subtract = Subtract(
+            subtract = self.modules.Subtract(
                 self.circuit, bit_length, self.one, operands[0], operands[1]
             )
             return subtract.out
         elif isinstance(stmt.op, ast.Lt):
-            lt = Lt(self.circuit, bit_length, self.one, operands[0], operands[1])
+            lt = self.modules.Lt(
+                self.circuit, bit_length, self.one, operands[0], operands[1]
+            )
             return lt.out
         elif isinstance(stmt.op, ast.LtE):
-            le = Le(self.circuit, bit_length, self.one, operands[0], operands[1])
+            le = self.modules.Le(
+                self.circuit, bit_length, self.one, operands[0], operands[1]
+            )
             return le.out
         elif isinstance(stmt.op, ast.Eq):
-            eq = Eq(self.circuit, bit_length, self.one, operands[0], operands[1])
+            eq = self.modules.Eq(
+                self.circuit, bit_length, self.one, operands[0], operands[1]
+            )
             return eq.out
         else:
             assert False, f'line {stmt.op.lineno}: unsupported operation {stmt.op}'
 
     def compile_if_expr(self, stmt: ast.IfExp) -> List[Wire]:
         test = self.compile_expr(stmt.test)
-        to_bool = ToBool(self.circuit, len(test), test)
+        to_bool = self.modules.ToBool(self.circuit, len(test), test)
         test = to_bool.out
         body = self.compile_expr(stmt.body)
         orelse = self.compile_expr(stmt.orelse)
@@ -82,7 +96,7 @@ class ASTCompiler:
         bit_length = len(body)
         result = []
         for i in range(bit_length):
-            select = Select(self.circuit, orelse[i], body[i], test[0])
+            select = self.modules.Select(self.circuit, orelse[i], body[i], test[0])
             result.append(select.out)
         return result
 
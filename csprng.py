@@ -1,5 +1,59 @@
+from typing import List, Optional
 from random import SystemRandom
+import hashlib
+import os
+import threading
 
 _sysrand = SystemRandom()
 choice = _sysrand.choice
 randint = _sysrand.randint
+
+
+class PRG:
+    # SHAKE-256 in counter mode keyed by a 32-byte seed, os.urandom by default.
+    # Output is drawn buffer_size bytes at a time, so the same seed and the same
+    # sequence of calls give the same bytes.
+    def __init__(self, seed: Optional[bytes] = None, buffer_size=1 << 16) -> None:
+        self.buffer_size = buffer_size
+        self.reseed(seed)
+
+    def reseed(self, seed: Optional[bytes] = None):
+        self.seed = os.urandom(32) if seed is None else seed
+        self.counter = 0
+        self.buffer = b''
+        self.pos = 0
+        self.lock = threading.Lock()
+
+    def _block(self, n: int) -> bytes:
+        h = hashlib.shake_256(self.seed + self.counter.to_bytes(8, 'little'))
+        self.counter += 1
+        return h.digest(n)
+
+    def random_bytes(self, n: int) -> bytes:
+        with self.lock:
+            if n > self.buffer_size:
+                return self._block(n)
+            if self.pos + n > len(self.buffer):
+                self.buffer, self.pos = self._block(self.buffer_size), 0
+            self.pos += n
+            return self.buffer[self.pos - n : self.pos]
+
+    def random_labels(self, count: int, bits: int) -> List[int]:
+        n = (bits + 7) // 8
+        mask = (1 << bits) - 1
+        buf = self.random_bytes(count * n)
+        return [
+            int.from_bytes(buf[i : i + n], 'little') & mask
+            for i in range(0, count * n, n)
+        ]
+
+    def __getstate__(self):
+        raise TypeError('a PRG is not shared between processes')
+
+
+default_prg = PRG()
+# a forked child must not repeat the output of its parent
+os.register_at_fork(after_in_child=default_prg.reseed)
+
+random_bytes = default_prg.random_bytes
+random_labels = default_prg.random_labels
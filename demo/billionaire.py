@@ -6,16 +6,21 @@ from comm.multi_threading import SenderThread, ReceiverThread
 from agent import Agent
 from garbled_circuit import GarbledCircuitProtocol
 from compiler.main import ASTCompiler
+from circuit_utils.passes import optimize
+from circuit_utils import and_minimal
 
 
 def main():
     with open('demo/scripts/billionaire.py', 'r') as f:
         code = f.read()
-    compiler = ASTCompiler()
+    compiler = ASTCompiler(and_minimal)
     circuit = compiler.compile(ast.parse(code))
+    circuit = optimize(circuit, compiler.constant_wires())
 
     bit_length = 64
-    protocol = GarbledCircuitProtocol(circuit, bit_length + 3, bit_length, 0, 1)
+    protocol = GarbledCircuitProtocol(
+        circuit, bit_length + 3, bit_length, 0, 1, garbling_scheme='half_gates'
+    )
 
     Alice = Agent()
     Alice.id = protocol.alice_id
@@ -1,31 +1,180 @@
-from typing import List, Any
+from typing import List, Any, Deque, Iterable, Iterator, Optional, Tuple
+from collections import deque
+from concurrent.futures import Executor
+import hashlib
+import itertools
+import os
+import pickle
+import time
 from agent import Agent
-from circuit import Circuit, Wire
-from circuit_utils.gates import Xor
-from oblivious_transfer import H, ObliviousTransferProtocol
-import queue, csprng
-
+from circuit import (
+    Circuit,
+    CompactCircuit,
+    GATE_TRUTH_TABLES,
+    GATE_XOR,
+    GATE_NOT,
+    evaluate_gate,
+)
+from oblivious_transfer import ObliviousTransferProtocol
+from ot_extension import OTExtensionProtocol
+import csprng
+
+# wire labels are (security_param // 8)-byte values kept as little-endian ints,
+# the lowest bit of a label is its permute bit
+
+# hash tweaks: gate i hashes with (i << 2) | _TWEAK_GATE, and with _TWEAK_HALF
+# for the second half gate, output j with (j << 2) | _TWEAK_OUTPUT
+_TWEAK_GATE = 0
+_TWEAK_HALF = 1
+_TWEAK_OUTPUT = 2
+
+
+def _half_gates_swaps(type_code: int) -> Tuple[int, int, int]:
+    # (alpha, beta, gamma) with gate(a, b) = ((a ^ alpha) & (b ^ beta)) ^ gamma,
+    # None for gates that are not AND-like
+    values = [evaluate_gate(type_code, a, b) for a in range(2) for b in range(2)]
+    if sum(values) not in [1, 3]:
+        return None
+    odd = 1 if sum(values) == 1 else 0
+    row = values.index(odd)
+    return (row >> 1) ^ 1, (row & 1) ^ 1, odd ^ 1
+
+
+_HALF_GATES_SWAPS = [_half_gates_swaps(t) for t in range(len(GATE_TRUTH_TABLES))]
+
+
+def gate_hash(n_bytes: int, tweak: int, label_a: int, label_b: int = 0) -> int:
+    # BLAKE2b truncated to n_bytes over label_a || label_b || tweak
+    h = hashlib.blake2b(
+        label_a.to_bytes(n_bytes, 'little')
+        + label_b.to_bytes(n_bytes, 'little')
+        + tweak.to_bytes(8, 'little'),
+        digest_size=n_bytes,
+    )
+    return int.from_bytes(h.digest(), 'little')
+
+
+def labels_to_bytes(labels: List[int], n_bytes: int) -> bytes:
+    return b''.join(label.to_bytes(n_bytes, 'little') for label in labels)
+
+
+def bytes_to_labels(buf: bytes, n_bytes: int) -> List[int]:
+    return [
+        int.from_bytes(buf[i : i + n_bytes], 'little')
+        for i in range(0, len(buf), n_bytes)
+    ]
+
+
+class LabelStore:
+    # the label pairs of every wire in a bytearray. With Delta only the
+    # zero-labels are kept and the one-labels are zero-label ^ Delta. With a
+    # seed the input labels are derived from it, so release() can drop every
+    # other label and the input labels can still be read.
+    n_bytes: int
+    Delta: Any
+    seed: Optional[bytes]
+
+    def __init__(self, n_wires: int, n_bytes: int, Delta=None, seed=None, inputs=()):
+        self.n_bytes = n_bytes
+        self.Delta = Delta
+        self.seed = seed
+        self.width = n_bytes if Delta is not None else 2 * n_bytes
+        self.buffer = bytearray(n_wires * self.width)
+        self.input_index = None
+        if seed is not None:
+            self.input_index = {w: k for k, w in enumerate(inputs)}
+
+    def derive(self, k: int) -> List[int]:
+        # labels of input k, a keyed BLAKE2b of k
+        nb = self.n_bytes
+        h = hashlib.blake2b(
+            k.to_bytes(8, 'little'), key=self.seed, digest_size=self.width
+        ).digest()
+        label = int.from_bytes(h[:nb], 'little')
+        if self.Delta is not None:
+            return [label, label ^ self.Delta]
+        # the one-label gets the other permute bit
+        return [label, int.from_bytes(h[nb:], 'little') & ~1 | (label & 1) ^ 1]
+
+    def __getitem__(self, w: int) -> List[int]:
+        if self.buffer is None:
+            return self.derive(self.input_index[w])
+        nb = self.n_bytes
+        start = w * self.width
+        label = int.from_bytes(self.buffer[start : start + nb], 'little')
+        if self.Delta is not None:
+            return [label, label ^ self.Delta]
+        return [
+            label,
+            int.from_bytes(self.buffer[start + nb : start + 2 * nb], 'little'),
+        ]
 
-def gen_binary_string(len):
-    ret = ''.join([csprng.choice(['0', '1']) for i in range(len)])
+    def __setitem__(self, w: int, labels: List[int]):
+        nb = self.n_bytes
+        start = w * self.width
+        self.buffer[start : start + nb] = labels[0].to_bytes(nb, 'little')
+        if self.Delta is None:
+            self.buffer[start + nb : start + 2 * nb] = labels[1].to_bytes(nb, 'little')
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LabelStore) and (
+            self.Delta,
+            self.seed,
+            self.buffer,
+        ) == (other.Delta, other.seed, other.buffer)
+
+    def release(self):
+        # keeps only what is needed to derive the input labels
+        assert self.seed is not None, 'labels without a seed cannot be derived'
+        self.buffer = None
+
+
+class GarbledInstance:
+    # one garbling of a circuit, to be used for a single evaluation
+    Delta: Any
+    wire_labels: LabelStore
+    tables: bytes
+    output_table: bytes
+
+    def __init__(self, Delta, wire_labels, tables, output_table) -> None:
+        self.Delta = Delta
+        self.wire_labels = wire_labels
+        self.tables = tables
+        self.output_table = output_table
+
+
+def _garble_jobs(protocol, Delta, jobs):
+    # runs in the workers of GarbledCircuitProtocol.garble_levels
+    ret = []
+    for i, t, labels_a, labels_b, fresh in jobs:
+        gen_label = iter(fresh).__next__ if fresh else None
+        ret.append(protocol.garble_gate(i, t, labels_a, labels_b, Delta, gen_label))
     return ret
 
 
-def int2str(x, length=None):
-    ret = bin(x)[2:]
-    if length is not None:
-        return ''.join(['0'] * (length - len(ret)) + [ret])
-    return bin(x)[2:]
+def _decrypt_jobs(protocol, jobs):
+    # runs in the workers of GarbledCircuitProtocol.evaluate_levels
+    return [
+        protocol.decrypt_gate(i, t, label_a, label_b, table, 0)
+        for i, t, label_a, label_b, table in jobs
+    ]
 
 
-def str2int(x):
-    return int(x, 2)
+def _map_slices(executor: Executor, n_workers: int, fn, *args):
+    # calls fn(*args[:-1], slice) on n_workers slices of the list args[-1] and
+    # chains the results
+    *args, jobs = args
+    size = -(-len(jobs) // n_workers)
+    slices = [jobs[k : k + size] for k in range(0, len(jobs), size)]
+    return itertools.chain.from_iterable(
+        executor.map(fn, *[itertools.repeat(arg) for arg in args], slices)
+    )
 
 
 class GarbledCircuitProtocol:
     alice_id: Any
     bob_id: Any
-    circuit: Circuit
+    circuit: CompactCircuit
     n_Alice_bits: int
     n_Bob_bits: int
     OT: ObliviousTransferProtocol
@@ -40,165 +189,574 @@ class GarbledCircuitProtocol:
         security_param=128,
         enable_GRR=True,
         enable_freeXOR=True,
+        garbling_scheme='classic',
+        chunk_size=None,
+        executor=None,
+        ot_group=None,
+        ot_extension=False,
+        correlated_ot=False,
+        output_decoding='hash',
+        derive_input_labels=False,
     ) -> None:
+        # garbling_scheme 'classic' sends 4 rows per gate, or 3 with enable_GRR,
+        # 'half_gates' sends 2 and needs enable_freeXOR.
+        # with chunk_size, input labels and OTs come first and the tables are
+        # garbled and sent chunk_size gates at a time, so bob evaluates them as
+        # they arrive.
+        # with executor, a concurrent.futures.ProcessPoolExecutor, alice garbles
+        # and bob decrypts the gates of each level in parallel.
+        # ot_group is the (g0, P) of the OT, see groups. With ot_extension,
+        # bob's input labels are sent by IKNP OT extension after security_param
+        # base OTs run once per protocol. correlated_ot, which needs
+        # ot_extension and enable_freeXOR, only transfers Delta corrections and
+        # takes the zero-labels of bob's wires from the OT.
+        # output_decoding 'permute_bits' sends the permute bit of every output
+        # zero-label instead of hashing output labels.
+        # with derive_input_labels the input labels come from a seed drawn
+        # per garbling, and pregarbled instances only keep Delta and the seed
+        # instead of the labels of every wire
+        assert security_param % 8 == 0, 'labels are whole bytes'
+        if garbling_scheme not in ['classic', 'half_gates']:
+            raise ValueError(f'unknown garbling scheme {garbling_scheme}')
+        if garbling_scheme == 'half_gates' and not enable_freeXOR:
+            raise ValueError('half-gates garbling needs free-XOR')
+        if output_decoding not in ['hash', 'permute_bits']:
+            raise ValueError(f'unknown output decoding {output_decoding}')
+        if correlated_ot and not (ot_extension and enable_freeXOR):
+            raise ValueError('correlated OT needs OT extension and free-XOR')
+        if isinstance(circuit, Circuit):
+            circuit = circuit.freeze()
         self.circuit = circuit
         self.n_Alice_bits = n_Alice_bits
         self.n_Bob_bits = n_Bob_bits
-        self.OT = ObliviousTransferProtocol(1 << (security_param + 1))
+        self.OT = ObliviousTransferProtocol(1 << (security_param + 1), ot_group)
         self.alice_id, self.bob_id = alice_id, bob_id
         self.OT.alice_id, self.OT.bob_id = alice_id, bob_id
+        self.OT_extension = (
+            OTExtensionProtocol(self.OT, security_param) if ot_extension else None
+        )
+        self.correlated_ot = correlated_ot
+        self.output_decoding = output_decoding
+        self.derive_input_labels = derive_input_labels
         self.security_param = security_param
+        self.label_bytes = security_param // 8
+        # source of every label and Delta, a csprng.PRG
+        self.prg = csprng.default_prg
         self.enable_GRR = enable_GRR
         self.enable_freeXOR = enable_freeXOR
+        self.garbling_scheme = garbling_scheme
+        if garbling_scheme == 'half_gates':
+            n_rows = 2
+        else:
+            n_rows = 3 if enable_GRR else 4
+        self.table_bytes = n_rows * self.label_bytes
+        self.chunk_size = chunk_size
+        self.executor = executor
+        # pregarbled instances: not yet sent, sent by alice_offline, and the
+        # tables bob got from bob_offline
+        self.garbled_pool: Deque[GarbledInstance] = deque()
+        self.shipped_pool: Deque[GarbledInstance] = deque()
+        self.received_pool: Deque[Tuple[bytes, bytes]] = deque()
+
+    def __getstate__(self):
+        # workers of garble_levels only need the garbling parameters
+        state = self.__dict__.copy()
+        for key in [
+            'circuit',
+            'OT',
+            'OT_extension',
+            'executor',
+            'prg',
+            'garbled_pool',
+            'shipped_pool',
+            'received_pool',
+        ]:
+            state.pop(key)
+        return state
+
+    def gen_label(self) -> int:
+        return int.from_bytes(self.prg.random_bytes(self.label_bytes), 'little')
+
+    def gen_label_pair(self, Delta=None, gen_label=None) -> List[int]:
+        gen_label = gen_label or self.gen_label
+        label = gen_label()
+        if Delta is not None:
+            return [label, label ^ Delta]
+        # the two labels of a wire always have different permute bits
+        return [label, gen_label() & ~1 | (label & 1) ^ 1]
+
+    def fresh_labels_per_gate(self) -> int:
+        # how many times garble_gate calls gen_label
+        if self.garbling_scheme == 'half_gates' or self.enable_GRR:
+            return 0 if self.enable_freeXOR else 1
+        return 1 if self.enable_freeXOR else 2
+
+    def is_free(self, t: int) -> bool:
+        return t == GATE_NOT or (self.enable_freeXOR and t == GATE_XOR)
+
+    def n_tables(self) -> int:
+        return sum(not self.is_free(t) for t in self.circuit.gate_types)
+
+    def table_offsets(self) -> List[int]:
+        # byte offset of the table of every non-free gate, -1 for free gates
+        offsets = [-1] * self.circuit.n_gates
+        offset = 0
+        for i, t in enumerate(self.circuit.gate_types):
+            if not self.is_free(t):
+                offsets[i] = offset
+                offset += self.table_bytes
+        return offsets
+
+    def garble_gate(
+        self,
+        i: int,
+        t: int,
+        labels_a: List[int],
+        labels_b: List[int],
+        Delta,
+        gen_label=None,
+    ) -> Tuple[List[int], bytes]:
+        # returns the label pair of the output wire and the garbled table
+        gen_label = gen_label or self.gen_label
+        nb = self.label_bytes
+        tweak = i << 2 | _TWEAK_GATE
+        if self.garbling_scheme == 'half_gates':
+            # the gate is ((a ^ alpha) & (b ^ beta)) ^ gamma, the swaps are done
+            # on the labels and the AND is garbled as two half gates
+            alpha, beta, gamma = _HALF_GATES_SWAPS[t]
+            a0, a1 = labels_a[alpha], labels_a[alpha ^ 1]
+            b0, b1 = labels_b[beta], labels_b[beta ^ 1]
+            p_a, p_b = a0 & 1, b0 & 1
+            ha0, ha1 = gate_hash(nb, tweak, a0), gate_hash(nb, tweak, a1)
+            hb0 = gate_hash(nb, tweak | _TWEAK_HALF, b0)
+            hb1 = gate_hash(nb, tweak | _TWEAK_HALF, b1)
+            # generator half computes a & p_b, evaluator half a & (b ^ p_b)
+            t_g = ha0 ^ ha1 ^ (Delta if p_b else 0)
+            t_e = hb0 ^ hb1 ^ a0
+            w_g = ha0 ^ (t_g if p_a else 0)
+            w_e = hb0 ^ (t_e ^ a0 if p_b else 0)
+            out = [None, None]
+            out[gamma] = w_g ^ w_e
+            out[gamma ^ 1] = w_g ^ w_e ^ Delta
+            return out, t_g.to_bytes(nb, 'little') + t_e.to_bytes(nb, 'little')
+
+        # rows[p_a << 1 | p_b] = (hash of the input labels, plaintext output)
+        rows = [None] * 4
+        for v_a in range(2):
+            label_a = labels_a[v_a]
+            for v_b in range(2):
+                label_b = labels_b[v_b]
+                rows[(label_a & 1) << 1 | label_b & 1] = (
+                    gate_hash(nb, tweak, label_a, label_b),
+                    evaluate_gate(t, v_a, v_b),
+                )
+        if self.enable_GRR:
+            # the output label of the last row is its hash, so that row
+            # encrypts to zero and is not sent
+            h, v = rows.pop()
+            out = [None, None]
+            out[v] = h
+            if Delta is not None:
+                out[v ^ 1] = h ^ Delta
+            else:
+                out[v ^ 1] = gen_label() & ~1 | (h & 1) ^ 1
+        else:
+            out = self.gen_label_pair(Delta, gen_label)
+        return out, b''.join((h ^ out[v]).to_bytes(nb, 'little') for h, v in rows)
+
+    def decrypt_gate(
+        self, i: int, t: int, label_a: int, label_b: int, tables: bytes, offset: int
+    ) -> int:
+        # decrypts the gate whose table starts at tables[offset]
+        nb = self.label_bytes
+        tweak = i << 2 | _TWEAK_GATE
+        if self.garbling_scheme == 'half_gates':
+            w = gate_hash(nb, tweak, label_a) ^ gate_hash(
+                nb, tweak | _TWEAK_HALF, label_b
+            )
+            if label_a & 1:
+                w ^= int.from_bytes(tables[offset : offset + nb], 'little')
+            if label_b & 1:
+                t_e = int.from_bytes(tables[offset + nb : offset + 2 * nb], 'little')
+                w ^= t_e ^ label_a
+            return w
+
+        h = gate_hash(nb, tweak, label_a, label_b)
+        row = (label_a & 1) << 1 | label_b & 1
+        if self.enable_GRR and row == 3:
+            return h
+        start = offset + row * nb
+        return h ^ int.from_bytes(tables[start : start + nb], 'little')
+
+    def garble_inputs(self) -> Tuple[Any, LabelStore]:
+        # returns Delta (None without free-XOR) and the wire labels with only the
+        # input wires set
+        c = self.circuit
+        Delta = self.gen_label() | 1 if self.enable_freeXOR else None
+        seed = self.prg.random_bytes(32) if self.derive_input_labels else None
+        wire_labels = LabelStore(c.n_wires, self.label_bytes, Delta, seed, c.inputs)
+        if seed is not None:
+            for k, w in enumerate(c.inputs):
+                wire_labels[w] = wire_labels.derive(k)
+        elif Delta is not None:
+            labels = self.prg.random_labels(len(c.inputs), self.security_param)
+            for w, label in zip(c.inputs, labels):
+                wire_labels[w] = [label, label ^ Delta]
+        else:
+            labels = iter(
+                self.prg.random_labels(2 * len(c.inputs), self.security_param)
+            )
+            for w in c.inputs:
+                wire_labels[w] = self.gen_label_pair(None, labels.__next__)
+        return Delta, wire_labels
 
-    def alice(
+    def garble_tables(
         self,
-        agent: Agent,
-        input_bits: List[int],
-    ):
+        Delta,
+        wire_labels: LabelStore,
+        chunk_size: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> Iterator[bytes]:
+        # fills in wire_labels gate by gate and yields the garbled tables of the
+        # non-free gates in gate order, chunk_size tables at a time
+        c = self.circuit
+        chunk_bytes = None if chunk_size is None else chunk_size * self.table_bytes
+        if executor is not None:
+            tables = self.garble_levels(Delta, wire_labels, executor)
+            step = chunk_bytes or len(tables)
+            for start in range(0, len(tables), step):
+                yield tables[start : start + step]
+            return
+        tables = bytearray()
+        for i in range(c.n_gates):
+            t, w_a, w_b, w_c = (
+                c.gate_types[i],
+                c.gate_in_a[i],
+                c.gate_in_b[i],
+                c.gate_out[i],
+            )
 
-        n = len(self.circuit.gates)
-        m = len(self.circuit.wires)
+            if self.is_free(t):
+                self.garble_free_gate(t, w_a, w_b, w_c, Delta, wire_labels)
+                continue
 
-        if self.enable_freeXOR:
-            Delta = str2int(gen_binary_string(self.security_param))
-        wire_labels = []
-        for i in range(m):
-            k0, p0 = (
-                str2int(gen_binary_string(self.security_param)),
-                csprng.randint(0, 1),
+            out, table = self.garble_gate(
+                i, t, wire_labels[w_a], wire_labels[w_b], Delta
             )
-            if self.enable_freeXOR:
-                k1, p1 = (k0 ^ Delta, p0 ^ 1)
+            tables += table
+            wire_labels[w_c] = out
+            if len(tables) == chunk_bytes:
+                yield bytes(tables)
+                tables = bytearray()
+        if tables:
+            yield bytes(tables)
+
+    def garble_free_gate(
+        self, t: int, w_a: int, w_b: int, w_c: int, Delta, wire_labels
+    ):
+        if t == GATE_NOT:
+            # free NOT: the output wire reuses the input labels swapped
+            wire_labels[w_c] = [wire_labels[w_a][1], wire_labels[w_a][0]]
+        else:
+            label = wire_labels[w_a][0] ^ wire_labels[w_b][0]
+            wire_labels[w_c] = [label, label ^ Delta]
+
+    def garble_levels(
+        self,
+        Delta,
+        wire_labels: LabelStore,
+        executor: Executor,
+        n_workers: Optional[int] = None,
+        min_parallel: int = 256,
+    ) -> bytes:
+        # garbles the non-free gates of each level in executor, levels with fewer
+        # than min_parallel of them are garbled here. The fresh labels of the
+        # non-free gates are drawn here in gate order, so the tables and labels
+        # are the same as the ones of garble_tables for the same prg.
+        c = self.circuit
+        n_workers = n_workers or os.cpu_count()
+        n_fresh = self.fresh_labels_per_gate()
+        table_offset = self.table_offsets()
+        fresh: List[List[int]] = [None] * c.n_gates
+        if n_fresh:
+            for i in range(c.n_gates):
+                if table_offset[i] >= 0:
+                    fresh[i] = [self.gen_label() for _ in range(n_fresh)]
+
+        tables = bytearray(self.n_tables() * self.table_bytes)
+        for level in c.levels():
+            jobs = []
+            for i in level.tolist():
+                t, w_a, w_b, w_c = (
+                    c.gate_types[i],
+                    c.gate_in_a[i],
+                    c.gate_in_b[i],
+                    c.gate_out[i],
+                )
+                if self.is_free(t):
+                    self.garble_free_gate(t, w_a, w_b, w_c, Delta, wire_labels)
+                else:
+                    jobs.append((i, t, wire_labels[w_a], wire_labels[w_b], fresh[i]))
+            if len(jobs) < min_parallel:
+                results = _garble_jobs(self, Delta, jobs)
+            else:
+                results = _map_slices(
+                    executor, n_workers, _garble_jobs, self, Delta, jobs
+                )
+            for job, (out, table) in zip(jobs, results):
+                i = job[0]
+                wire_labels[c.gate_out[i]] = out
+                tables[table_offset[i] : table_offset[i] + self.table_bytes] = table
+        return bytes(tables)
+
+    def garble_outputs(self, wire_labels: LabelStore) -> bytes:
+        # 'hash' decoding: one byte per output with the bit to xor with the
+        # hashed label for each permute bit. 'permute_bits': the permute bits of
+        # the zero-labels, packed eight outputs per byte
+        nb = self.label_bytes
+        output_table = bytearray()
+        if self.output_decoding == 'permute_bits':
+            output_table = bytearray((len(self.circuit.outputs) + 7) // 8)
+            for j, output_wire in enumerate(self.circuit.outputs):
+                output_table[j >> 3] |= (wire_labels[output_wire][0] & 1) << (j & 7)
+            return bytes(output_table)
+        for j, output_wire in enumerate(self.circuit.outputs):
+            e = 0
+            for v in range(2):
+                label = wire_labels[output_wire][v]
+                tweak = j << 2 | _TWEAK_OUTPUT
+                e |= ((gate_hash(nb, tweak, label) & 1) ^ v) << (label & 1)
+            output_table.append(e)
+        return bytes(output_table)
+
+    def garble(
+        self, executor: Optional[Executor] = None
+    ) -> Tuple[LabelStore, bytes, bytes]:
+        # returns the label pairs of every wire, the garbled tables of the
+        # non-free gates in gate order and the output decoding table
+        Delta, wire_labels = self.garble_inputs()
+        tables = b''.join(self.garble_tables(Delta, wire_labels, executor=executor))
+        return wire_labels, tables, self.garble_outputs(wire_labels)
+
+    def evaluate_tables(
+        self, inputs_labels: List[int], chunks: Iterable[bytes]
+    ) -> List[int]:
+        # returns the labels of the outputs. Labels are kept in the slots of
+        # circuit.registers(), so a label is dropped once its last gate has
+        # run, and the next chunk of tables is only taken from chunks once the
+        # previous one is used up.
+        c = self.circuit
+        n_slots, slot_a, slot_b, slot_out, input_slots, output_slots = c.registers()
+        regs: List[int] = [-1] * n_slots
+        for s, label in zip(input_slots, inputs_labels):
+            regs[s] = label
+
+        chunks = iter(chunks)
+        tables = b''
+        offset = 0
+        for i in range(c.n_gates):
+            t, s_a, s_b, s_c = c.gate_types[i], slot_a[i], slot_b[i], slot_out[i]
+            if t == GATE_NOT:
+                regs[s_c] = regs[s_a]
+            elif self.enable_freeXOR and t == GATE_XOR:
+                regs[s_c] = regs[s_a] ^ regs[s_b]
             else:
-                k1, p1 = (str2int(gen_binary_string(self.security_param)), p0 ^ 1)
-            wire_labels.append([k0 << 1 | p0, k1 << 1 | p1])
+                if offset == len(tables):
+                    tables, offset = next(chunks), 0
+                regs[s_c] = self.decrypt_gate(
+                    i, t, regs[s_a], regs[s_b], tables, offset
+                )
+                offset += self.table_bytes
+        return [regs[s] for s in output_slots]
 
-        garbled_tables_for_gates = []
+    def evaluate_levels(
+        self,
+        inputs_labels: List[int],
+        tables: bytes,
+        executor: Executor,
+        n_workers: Optional[int] = None,
+        min_parallel: int = 256,
+    ) -> List[int]:
+        # like evaluate_tables with all tables at hand, but the non-free gates
+        # of each level are decrypted in executor, except for levels with fewer
+        # than min_parallel of them. Labels of every wire are kept, as levels
+        # are not in gate order. self.level_timings gets the number of non-free
+        # gates and the seconds spent on each level.
+        c = self.circuit
+        n_workers = n_workers or os.cpu_count()
+        nb = self.table_bytes
+        table_offset = self.table_offsets()
+        wire_ret: List[int] = [-1] * c.n_wires
+        for i in range(len(c.inputs)):
+            wire_ret[c.inputs[i]] = inputs_labels[i]
+
+        self.level_timings = []
+        for level in c.levels():
+            start = time.perf_counter()
+            jobs = []
+            for i in level.tolist():
+                t, w_a, w_b, w_c = (
+                    c.gate_types[i],
+                    c.gate_in_a[i],
+                    c.gate_in_b[i],
+                    c.gate_out[i],
+                )
+                if t == GATE_NOT:
+                    wire_ret[w_c] = wire_ret[w_a]
+                elif self.enable_freeXOR and t == GATE_XOR:
+                    wire_ret[w_c] = wire_ret[w_a] ^ wire_ret[w_b]
+                else:
+                    offset = table_offset[i]
+                    table = tables[offset : offset + nb]
+                    jobs.append((i, t, wire_ret[w_a], wire_ret[w_b], table))
+            if len(jobs) < min_parallel:
+                results = _decrypt_jobs(self, jobs)
+            else:
+                results = _map_slices(executor, n_workers, _decrypt_jobs, self, jobs)
+            for job, label in zip(jobs, results):
+                wire_ret[c.gate_out[job[0]]] = label
+            self.level_timings.append((len(jobs), time.perf_counter() - start))
+        return [wire_ret[w] for w in c.outputs]
+
+    def decode_outputs(
+        self, output_labels: List[int], output_table: bytes
+    ) -> List[int]:
+        if self.output_decoding == 'permute_bits':
+            return [
+                (label & 1) ^ (output_table[j >> 3] >> (j & 7) & 1)
+                for j, label in enumerate(output_labels)
+            ]
+        nb = self.label_bytes
+        return [
+            (gate_hash(nb, j << 2 | _TWEAK_OUTPUT, label) & 1)
+            ^ (output_table[j] >> (label & 1) & 1)
+            for j, label in enumerate(output_labels)
+        ]
 
-        for gate in self.circuit.gates:
-            assert len(gate.inputs) == 2
-            w_a, w_b = gate.inputs
-            w_c = gate.output
+    def evaluate(
+        self, tables: bytes, output_table: bytes, inputs_labels: List[int]
+    ) -> List[int]:
+        output_labels = self.evaluate_tables(inputs_labels, [tables])
+        return self.decode_outputs(output_labels, output_table)
+
+    def pregarble(self, count: int, executor: Optional[Executor] = None):
+        # offline phase: garbles count instances for later alice calls
+        for _ in range(count):
+            Delta, wire_labels = self.garble_inputs()
+            tables = b''.join(self.garble_tables(Delta, wire_labels, executor=executor))
+            output_table = self.garble_outputs(wire_labels)
+            if self.derive_input_labels:
+                wire_labels.release()
+            self.garbled_pool.append(
+                GarbledInstance(Delta, wire_labels, tables, output_table)
+            )
 
-            if self.enable_freeXOR and isinstance(gate, Xor):
-                wire_labels[w_c.index][0] = (
-                    wire_labels[w_a.index][0] ^ wire_labels[w_b.index][0]
-                )
-                wire_labels[w_c.index][1] = wire_labels[w_c.index][0] ^ (Delta << 1 | 1)
-                garbled_tables_for_gates.append(None)
-            elif self.enable_GRR:
-                for v_a, v_b in [(0, 0), (0, 1), (1, 0), (1, 1)]:
-                    k_a, p_a = (
-                        wire_labels[w_a.index][v_a] >> 1,
-                        wire_labels[w_a.index][v_a] & 1,
-                    )
-
-                    k_b, p_b = (
-                        wire_labels[w_b.index][v_b] >> 1,
-                        wire_labels[w_b.index][v_b] & 1,
-                    )
-                    if p_a == 1 and p_b == 1:
-                        ret = gate.evaluate([v_a, v_b])
-                        wire_labels[w_c.index][ret] = H(
-                            int2str(k_a, self.security_param)
-                            + int2str(k_b, self.security_param)
-                            + int2str(gate.index)
-                        )
-                        wire_labels[w_c.index][ret ^ 1] = wire_labels[w_c.index][
-                            ret
-                        ] ^ (Delta << 1 | 1)
-                        break
-
-                table_e = [-1] * 4
-                for v_a, v_b in [(0, 0), (0, 1), (1, 0), (1, 1)]:
-                    k_a, p_a = (
-                        wire_labels[w_a.index][v_a] >> 1,
-                        wire_labels[w_a.index][v_a] & 1,
-                    )
-
-                    k_b, p_b = (
-                        wire_labels[w_b.index][v_b] >> 1,
-                        wire_labels[w_b.index][v_b] & 1,
-                    )
-
-                    e = (
-                        H(
-                            int2str(k_a, self.security_param)
-                            + int2str(k_b, self.security_param)
-                            + int2str(gate.index)
-                        )
-                        ^ wire_labels[w_c.index][gate.evaluate([v_a, v_b])]
-                    )
-                    table_e[p_a << 1 | p_b] = e
-                    if p_a == 1 and p_b == 1:
-                        assert e == 0
-                garbled_tables_for_gates.append(table_e[:-1])
+    def alice_offline(self, agent: Agent):
+        # sends the tables of every pregarbled instance to bob, the next alice
+        # calls then only send input labels and run the OTs
+        agent.sender.send(self.bob_id, len(self.garbled_pool))
+        while self.garbled_pool:
+            instance = self.garbled_pool.popleft()
+            agent.sender.send(self.bob_id, (instance.tables, instance.output_table))
+            self.shipped_pool.append(instance)
+
+    def bob_offline(self, agent: Agent) -> int:
+        _, count = agent.receiver.receive()
+        for _ in range(count):
+            _, instance = agent.receiver.receive()
+            self.received_pool.append(instance)
+        return count
+
+    def save_pool(self, path: str):
+        # the garbler secrets are written as is, keep the file private
+        with open(path, 'wb') as f:
+            pickle.dump(list(self.garbled_pool), f)
+
+    def load_pool(self, path: str):
+        with open(path, 'rb') as f:
+            self.garbled_pool.extend(pickle.load(f))
+
+    def alice(
+        self,
+        agent: Agent,
+        input_bits: List[int],
+    ):
+        c = self.circuit
+        chunk_size = self.chunk_size
+        shipped = bool(self.shipped_pool)
+        if shipped:
+            instance = self.shipped_pool.popleft()
+        elif self.garbled_pool:
+            instance = self.garbled_pool.popleft()
+        else:
+            instance = None
+
+        if instance is None:
+            Delta, wire_labels = self.garble_inputs()
+            chunks = self.garble_tables(Delta, wire_labels, chunk_size, self.executor)
+        else:
+            wire_labels = instance.wire_labels
+            step = len(instance.tables) or 1
+            if chunk_size is not None:
+                step = chunk_size * self.table_bytes
+            chunks = (
+                instance.tables[start : start + step]
+                for start in range(0, len(instance.tables), step)
+            )
 
+        def send_outputs():
+            if instance is None:
+                output_table = self.garble_outputs(wire_labels)
             else:
-                table_e = [-1] * 4
-                for v_a, v_b in [(0, 0), (0, 1), (1, 0), (1, 1)]:
-                    k_a, p_a = (
-                        wire_labels[w_a.index][v_a] >> 1,
-                        wire_labels[w_a.index][v_a] & 1,
-                    )
-
-                    k_b, p_b = (
-                        wire_labels[w_b.index][v_b] >> 1,
-                        wire_labels[w_b.index][v_b] & 1,
-                    )
-
-                    e = (
-                        H(
-                            int2str(k_a, self.security_param)
-                            + int2str(k_b, self.security_param)
-                            + int2str(gate.index)
-                        )
-                        ^ wire_labels[w_c.index][gate.evaluate([v_a, v_b])]
-                    )
-                    table_e[p_a << 1 | p_b] = e
-
-                garbled_tables_for_gates.append(table_e)
-
-        garbled_tables_for_outputs = []
-        for output_wire in self.circuit.outputs:
-            table_e = [-1] * 2
-            for v in [0, 1]:
-                k_v, p_v = (
-                    wire_labels[output_wire.index][v] >> 1,
-                    wire_labels[output_wire.index][v] & 1,
-                )
-                assert output_wire.input is not None
-                gate = output_wire.input
-                e = (
-                    H(int2str(k_v, self.security_param) + 'out' + int2str(gate.index))
-                    & 1
-                ) ^ v
-                table_e[p_v] = e
-            garbled_tables_for_outputs.append(table_e)
+                output_table = instance.output_table
+            agent.sender.send(self.bob_id, output_table)
+
+        # tables go first unless they are streamed, were shipped offline or
+        # depend on the correlated OT
+        tables_first = not shipped and chunk_size is None and not self.correlated_ot
+        if tables_first:
+            agent.sender.send(self.bob_id, b''.join(chunks))
+            send_outputs()
 
         inputs_labels = []
         for i in range(self.n_Alice_bits):
-            wire, bit = self.circuit.inputs[i], input_bits[i]
-            inputs_labels.append(wire_labels[wire.index][bit])
-
-        agent.sender.send(self.bob_id, garbled_tables_for_gates)
-        agent.sender.send(self.bob_id, garbled_tables_for_outputs)
-        agent.sender.send(self.bob_id, inputs_labels)
-
-        # print('garbled_gates:', garbled_tables_for_gates)
-        # print('garbled_outputs', garbled_tables_for_outputs)
-        # print('labelsA:', inputs_labels)
-
-        for i in range(self.n_Bob_bits):
-            wire = self.circuit.inputs[self.n_Alice_bits + i]
-            self.OT.alice(
-                agent,
-                [
-                    wire_labels[wire.index][0],
-                    wire_labels[wire.index][1],
-                ],
+            wire, bit = c.inputs[i], input_bits[i]
+            inputs_labels.append(wire_labels[wire][bit])
+
+        bob_wires = c.inputs[self.n_Alice_bits : self.n_Alice_bits + self.n_Bob_bits]
+        if self.correlated_ot:
+            # the zero-labels of bob's wires come out of the OT, a pregarbled
+            # instance sends the offsets to its own zero-labels instead
+            if instance is not None:
+                Delta = instance.Delta
+            x0s = self.OT_extension.alice_correlated(
+                agent, Delta, len(bob_wires), self.label_bytes
+            )
+            if instance is None:
+                for w, x0 in zip(bob_wires, x0s):
+                    wire_labels[w] = [x0, x0 ^ Delta]
+            else:
+                inputs_labels += [
+                    wire_labels[w][0] ^ x0 for w, x0 in zip(bob_wires, x0s)
+                ]
+            agent.sender.send(
+                self.bob_id, labels_to_bytes(inputs_labels, self.label_bytes)
             )
+        else:
+            agent.sender.send(
+                self.bob_id, labels_to_bytes(inputs_labels, self.label_bytes)
+            )
+            if self.OT_extension is not None:
+                self.OT_extension.alice(
+                    agent, [wire_labels[w] for w in bob_wires], self.label_bytes
+                )
+            else:
+                self.OT.alice_batch(agent, [wire_labels[w] for w in bob_wires])
+
+        if not shipped and not tables_first:
+            for chunk in chunks:
+                agent.sender.send(self.bob_id, chunk)
+            send_outputs()
 
         _, ret = agent.receiver.receive()
         return ret
@@ -208,89 +766,58 @@ class GarbledCircuitProtocol:
         agent: Agent,
         input_bits: List[int],
     ):
-        _, garbled_tables_for_gates = agent.receiver.receive()
-        _, garbled_tables_for_outputs = agent.receiver.receive()
-        _, inputs_labels_A = agent.receiver.receive()
-        # print('_garbled_gates:', garbled_tables_for_gates)
-        # print('_garbled_outputs', garbled_tables_for_outputs)
-        # print('_labelsA:', inputs_labels_A)
-
-        if self.enable_GRR:
-            for table_e in garbled_tables_for_gates:
-                if table_e is not None:
-                    table_e.append(0)
-        inputs_labels_B = []
-        for i in range(self.n_Bob_bits):
-            inputs_labels_B.append(self.OT.bob(agent, input_bits[i]))
-
-        inputs_labels = inputs_labels_A + inputs_labels_B
+        chunk_size = self.chunk_size
+        shipped = bool(self.received_pool)
+        tables_first = not shipped and chunk_size is None and not self.correlated_ot
+        if shipped:
+            tables, output_table = self.received_pool.popleft()
+        elif tables_first:
+            _, tables = agent.receiver.receive()
+            _, output_table = agent.receiver.receive()
+
+        bob_bits = input_bits[: self.n_Bob_bits]
+        nb = self.label_bytes
+        if self.correlated_ot:
+            inputs_labels_B = self.OT_extension.bob_correlated(agent, bob_bits, nb)
+            _, inputs_labels_A = agent.receiver.receive()
+            inputs_labels = bytes_to_labels(inputs_labels_A, nb)
+            if len(inputs_labels) > self.n_Alice_bits:
+                offsets = inputs_labels[self.n_Alice_bits :]
+                del inputs_labels[self.n_Alice_bits :]
+                inputs_labels_B = [
+                    label ^ offset for label, offset in zip(inputs_labels_B, offsets)
+                ]
+            inputs_labels += inputs_labels_B
+        else:
+            _, inputs_labels_A = agent.receiver.receive()
+            inputs_labels = bytes_to_labels(inputs_labels_A, nb)
+            if self.OT_extension is not None:
+                inputs_labels += self.OT_extension.bob(agent, bob_bits, nb)
+            else:
+                inputs_labels += self.OT.bob_batch(agent, bob_bits)
         assert len(inputs_labels) == self.n_Alice_bits + self.n_Bob_bits
-        # print(inputs_labels)
-        n = len(self.circuit.gates)
-        m = len(self.circuit.wires)
-        in_deg: List[int] = [0] * n
-        wire_ret: List[int] = [-1] * m
-        for wire in self.circuit.wires:
-            for out_gate in wire.outputs:
-                if out_gate is not None:
-                    in_deg[out_gate.index] += 1
-        q = queue.Queue()
-        for i in range(len(self.circuit.inputs)):
-            # print('hhhhhh', inputs_labels[i])
-            wire_ret[self.circuit.inputs[i].index] = inputs_labels[i]
-            q.put(self.circuit.inputs[i])
-
-        while not q.empty():
-            wire = q.get()
-            for out_gate in wire.outputs:
-                if out_gate is not None:
-                    in_deg[out_gate.index] -= 1
-                    if in_deg[out_gate.index] == 0:
-                        assert len(out_gate.inputs) == 2
-                        w_a, w_b = out_gate.inputs
-                        w_c = out_gate.output
-                        # print('wtf', wire_ret[w_a.index], wire_ret[w_b.index])
-                        k_a, p_a = wire_ret[w_a.index] >> 1, wire_ret[w_a.index] & 1
-                        k_b, p_b = wire_ret[w_b.index] >> 1, wire_ret[w_b.index] & 1
-
-                        if self.enable_freeXOR and isinstance(out_gate, Xor):
-                            wire_ret[w_c.index] = (
-                                wire_ret[w_a.index] ^ wire_ret[w_b.index]
-                            )
-
-                        else:
-
-                            wire_ret[w_c.index] = (
-                                H(
-                                    int2str(k_a, self.security_param)
-                                    + int2str(k_b, self.security_param)
-                                    + int2str(out_gate.index)
-                                )
-                                ^ garbled_tables_for_gates[out_gate.index][
-                                    p_a << 1 | p_b
-                                ]
-                            )
-
-                        q.put(w_c)
-
-        # for output_wire in self.circuit.outputs:
-        #     print('index=', output_wire.index)
-        # print('start', flush=True)
-        # print(len(self.circuit.outputs))
-        output_bits = [
-            (
-                H(
-                    int2str(wire_ret[output_wire.index] >> 1, self.security_param)
-                    + 'out'
-                    + int2str(output_wire.input.index)
-                )
-                & 1
+
+        if shipped or tables_first:
+            # the iterator holds the only reference, so the tables go with it
+            chunks = iter([tables])
+            del tables
+        else:
+            chunks = iter(lambda: agent.receiver.receive()[1], None)
+        if self.executor is not None:
+            # levels are not in gate order, so all chunks are needed first
+            n_bytes = self.n_tables() * self.table_bytes
+            chunks = iter(chunks)
+            tables = bytearray()
+            while len(tables) < n_bytes:
+                tables += next(chunks)
+            output_labels = self.evaluate_levels(
+                inputs_labels, bytes(tables), self.executor
             )
-            ^ garbled_tables_for_outputs[i][wire_ret[output_wire.index] & 1]
-            for i, output_wire in enumerate(self.circuit.outputs)
-        ]
-        # output_bits = [0] * len(self.circuit.outputs)
-        # print('hello', flush=True)
+        else:
+            output_labels = self.evaluate_tables(inputs_labels, chunks)
+        if not shipped and not tables_first:
+            _, output_table = agent.receiver.receive()
+
+        output_bits = self.decode_outputs(output_labels, output_table)
         agent.sender.send(self.alice_id, output_bits)
-        # print('end', flush=True)
         return output_bits
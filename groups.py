@@ -0,0 +1,210 @@
+from typing import Dict, Optional, Tuple
+import json
+import os
+from prime import gen_g0
+
+# groups for the Bellare-Micali OT as (g0, P) with P a safe prime, keyed by the
+# bit length of P
+
+
+def _modp(x: str) -> Tuple[int, int]:
+    return 2, int(x, 16)
+
+
+# RFC 3526 MODP groups
+# https://www.rfc-editor.org/rfc/rfc3526
+MODP_GROUPS: Dict[int, Tuple[int, int]] = {
+    # group 5
+    1536: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA237327FFFFFFFFFFFFFFFF'
+    ),
+    # group 14
+    2048: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718'
+        '3995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF'
+    ),
+    # group 15
+    3072: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718'
+        '3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33'
+        'A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7'
+        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864'
+        'D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2'
+        '08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A93AD2CAFFFFFFFFFFFFFFFF'
+    ),
+    # group 16
+    4096: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718'
+        '3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33'
+        'A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7'
+        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864'
+        'D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2'
+        '08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7'
+        '88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8'
+        'DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2'
+        '233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9'
+        '93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C934063199FFFFFFFFFFFFFFFF'
+    ),
+    # group 17
+    6144: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718'
+        '3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33'
+        'A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7'
+        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864'
+        'D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2'
+        '08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7'
+        '88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8'
+        'DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2'
+        '233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9'
+        '93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026'
+        'C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE'
+        'B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B'
+        'DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC'
+        'F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E'
+        '59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA'
+        'CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76'
+        'F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468'
+        '043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DCC4024FFFFFFFFFFFFFFFF'
+    ),
+    # group 18
+    8192: _modp(
+        'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74'
+        '020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437'
+        '4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05'
+        '98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB'
+        '9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718'
+        '3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33'
+        'A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7'
+        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864'
+        'D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2'
+        '08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7'
+        '88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8'
+        'DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2'
+        '233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9'
+        '93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026'
+        'C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE'
+        'B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B'
+        'DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC'
+        'F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E'
+        '59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA'
+        'CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76'
+        'F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468'
+        '043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DBE115974A3926F12FEE5E4'
+        '38777CB6A932DF8CD8BEC4D073B931BA3BC832B68D9DD300741FA7BF8AFC47ED'
+        '2576F6936BA424663AAB639C5AE4F5683423B4742BF1C978238F16CBE39D652D'
+        'E3FDB8BEFC848AD922222E04A4037C0713EB57A81A23F0C73473FC646CEA306B'
+        '4BCBC8862F8385DDFA9D4B7FA2C087E879683303ED5BDD3A062B3CF5B3A278A6'
+        '6D2A13F83F44F82DDF310EE074AB6A364597E899A0255DC164F31CC50846851D'
+        'F9AB48195DED7EA1B1D510BD7EE74D73FAF36BC31ECFA268359046F4EB879F92'
+        '4009438B481C6CD7889A002ED5EE382BC9190DA6FC026E479558E4475677E9AA'
+        '9E3050E2765694DFC81F56E880B96E7160C980DD98EDD3DFFFFFFFFFFFFFFFFF'
+    ),
+}
+
+# safe primes pregenerated with prime.gen_g0 for the sizes used by
+# GarbledCircuitProtocol (security_param + 3 bits) and the default
+# ObliviousTransferProtocol
+SAFE_PRIMES: Dict[int, Tuple[int, int]] = {
+    67: (0x30A374767B0021895, 0x47BE5E10D5D609F47),
+    83: (0xE3009C6F8B81EE78D769, 0x5C59F794BDC7D276D752F),
+    99: (0x2DC52DBF8DF05039382C8DAC2, 0x4B84885681E508A8FB33375B7),
+    115: (0x2D0DF4D4C715A44724E2E50742F13, 0x53163383B17DFF97BFE4032DFB6EF),
+    131: (0x41A37B0821160F63C028E562B28B5601, 0x68491CBDE6F072C90546A77AF92F599AB),
+    168: (
+        0x1A2DD027183E4A7ACBFB212D335063E416BA09FE9B,
+        0xE2B4A54C45E5F30BB3D3410C73EACDADA00B1876CB,
+    ),
+    195: (
+        0xD9B8B6CC5091A34C37143CCEE20AE342AAB80696AAE0D673,
+        0x64EA5D8A60E28A682F5285D6281DC191AAFD80816BDC31D47,
+    ),
+    259: (
+        0x691AC57CAFC9567D07CDF2EAC85BC0CD476F441AF6238FBE6AD965CB9EEC3CC97,
+        0x790D8711E65241A2B34BC15C7E04D070250E047AD4F2BE0372F6C423CEDD7AA87,
+    ),
+}
+
+# symmetric security level of each MODP group, NIST SP 800-57 for the ones it
+# lists and the RFC 3526 estimate for 1536
+_MODP_STRENGTH = {1536: 90, 2048: 112, 3072: 128, 4096: 152, 6144: 176, 8192: 200}
+
+CACHE_PATH = os.environ.get(
+    'GC_GROUP_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'gc_groups.json')
+)
+
+_generated: Dict[int, Tuple[int, int]] = {}
+
+
+def load_cache(path: str) -> Dict[int, Tuple[int, int]]:
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {int(bits): (int(g, 16), int(P, 16)) for bits, (g, P) in cache.items()}
+
+
+def save_cache(path: str, groups: Dict[int, Tuple[int, int]]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({bits: [hex(g), hex(P)] for bits, (g, P) in groups.items()}, f)
+    os.replace(tmp, path)
+
+
+def get_group(bits: int, cache_path: Optional[str] = CACHE_PATH) -> Tuple[int, int]:
+    # a group whose modulus has exactly bits bits: a registered one, else one
+    # from the cache, else a new one which is added to the cache
+    if bits in MODP_GROUPS:
+        return MODP_GROUPS[bits]
+    if bits in SAFE_PRIMES:
+        return SAFE_PRIMES[bits]
+    if bits in _generated:
+        return _generated[bits]
+    cache = load_cache(cache_path) if cache_path else {}
+    if bits not in cache:
+        # P = 2p + 1 with p in [2^(bits - 2), 2^(bits - 1))
+        cache[bits] = gen_g0(1 << (bits - 2))
+        if cache_path:
+            save_cache(cache_path, cache)
+    _generated[bits] = cache[bits]
+    return cache[bits]
+
+
+def group_for_security(level: int) -> Tuple[int, int]:
+    # the smallest MODP group reaching level bits of security
+    for bits in sorted(MODP_GROUPS):
+        if _MODP_STRENGTH[bits] >= level:
+            return MODP_GROUPS[bits]
+    raise ValueError(f'no registered group reaches {level} bits of security')
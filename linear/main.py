@@ -8,7 +8,7 @@ from typing import List
 from circuit import Circuit, Wire
 from circuit_utils import bits2int, int2bits
 from circuit_utils.gates import And, Not, Xor
-from circuit_utils.modules import Add, Negate, Select, Lt
+import circuit_utils.modules
 
 
 def bits2int_signed(bits: List[int]) -> int:
@@ -84,7 +84,9 @@ class Fc:
         params = [y for x in self.params.values() for y in x]
         return wires, params
 
-    def build_circuit(self, circuit: Circuit, x: List[Wire], zero, one):
+    def build_circuit(
+        self, circuit: Circuit, x: List[Wire], zero, one, modules=circuit_utils.modules
+    ):
         bit_length = 32
 
         ret = []
@@ -93,11 +95,12 @@ class Fc:
             for j in range(self.in_c):
                 t = i * self.in_c + j
                 pos = self.wires['weight'][t * bit_length : (t + 1) * bit_length]
-                neg = Negate(circuit, bit_length, one, pos).out
+                neg = modules.Negate(circuit, bit_length, one, pos).out
                 tmp = [
-                    Select(circuit, pos[_], neg[_], x[j]).out for _ in range(bit_length)
+                    modules.Select(circuit, pos[_], neg[_], x[j]).out
+                    for _ in range(bit_length)
                 ]
-                adder = Add(circuit, bit_length, adder, tmp).out
+                adder = modules.Add(circuit, bit_length, adder, tmp).out
             ret.append(adder)
         # print(self.weight[:, 0])
         # print(self.bias)
@@ -129,15 +132,17 @@ class Net:
             params.extend(_params)
         return wires, params
 
-    def build_circuit(self, circuit: Circuit, x: List[Wire], zero, one):
-        x = self.fc.build_circuit(circuit, x, zero, one)
+    def build_circuit(
+        self, circuit: Circuit, x: List[Wire], zero, one, modules=circuit_utils.modules
+    ):
+        x = self.fc.build_circuit(circuit, x, zero, one, modules)
         bit_length = 32
         ret = []
         for i in range(10):
             now = one
             for j in range(10):
                 if i != j:
-                    tmp = Lt(circuit, bit_length, one, x[j], x[i]).out[0]
+                    tmp = modules.Lt(circuit, bit_length, one, x[j], x[i]).out[0]
                     out = Wire()
                     circuit.add_wire(out)
                     circuit.add_gate(And(now, tmp, out))
@@ -164,7 +169,8 @@ class Transform:
         return x
 
 
-def build_circuit(load_path):
+def build_circuit(load_path, modules=circuit_utils.modules):
+    # modules is circuit_utils.modules or circuit_utils.and_minimal
     checkpoint = torch.load(load_path, map_location='cpu')
     model = Net()
     model.load(checkpoint)
@@ -182,7 +188,7 @@ def build_circuit(load_path):
 
     circuit.inputs = input + param_wires + [zero, one]
     circuit.outputs = []
-    output = model.build_circuit(circuit, input, zero, one)
+    output = model.build_circuit(circuit, input, zero, one, modules)
     circuit.outputs = output
     # for _ in output:
     #     circuit.outputs.extend(_)
@@ -209,22 +215,25 @@ def eval():
         print(cnt, pos, pos / cnt)
 
 
+def evaluate_batch(circuit, params, xs, ys):
+    for y, p in zip(ys, circuit.evaluate_batch([x + params for x in xs])):
+        print(y, p.tolist())
+
+
 if __name__ == '__main__':
     circuit, params = build_circuit('linear/linear.pt')
+    circuit = circuit.freeze()
     transform = Transform()
 
     test_set = datasets.MNIST('../data', train=False)
-    cnt, pos = 0, 0
+    batch_size = 64
+    xs, ys = [], []
     for x, y in test_set:
         x = transform.forward(x)
-        x = [0 if _ > 0 else 1 for _ in x]
-        p = circuit.evaluate(x + params)
-        print(y, p)
-        # bit_length = 32
-        # p = [
-        #     bits2int_signed(p[i * bit_length : (i + 1) * bit_length]) for i in range(10)
-        # ]
-        # p = np.array(p)
-        # cnt += 1
-        # pos += p.argmax().item() == y
-        # print(cnt, pos, pos / cnt)
+        xs.append([0 if _ > 0 else 1 for _ in x])
+        ys.append(y)
+        if len(xs) == batch_size:
+            evaluate_batch(circuit, params, xs, ys)
+            xs, ys = [], []
+    if xs:
+        evaluate_batch(circuit, params, xs, ys)
@@ -1,20 +1,18 @@
 import csprng
 import hashlib
 
-from typing import List, Any
+from typing import List, Any, Optional, Tuple
 from agent import Agent
-from prime import pwr, gen_g0
+from prime import pwr, fixed_base
+from groups import get_group
 
 # Bellare-Micali Construction
 # https://crypto.stanford.edu/pbc/notes/crypto/ot.html
 
 
-def H(x):
-    s = hashlib.sha256()
-    s.update(str(x).encode())
-    h = int(s.hexdigest(), base=16)
-    # print(x,str(x).encode(), s.hexdigest(), h)
-    return h
+def H(x: int) -> int:
+    s = hashlib.sha256(x.to_bytes((x.bit_length() + 7) // 8, 'big'))
+    return int.from_bytes(s.digest(), 'big')
 
 
 class ObliviousTransferProtocol:
@@ -23,9 +21,14 @@ class ObliviousTransferProtocol:
     alice_id: Any
     bob_id: Any
 
-    def __init__(self, n=1e50) -> None:
-        # TODO:
-        self.g0, self.P = gen_g0(n)
+    def __init__(self, n=1e50, group: Optional[Tuple[int, int]] = None) -> None:
+        # group is (g0, P) as in groups, by default a registered or cached group
+        # whose modulus is a bit longer than n
+        if group is None:
+            group = get_group(int(n).bit_length() + 1)
+        self.g0, self.P = group
+        # g0 is raised to a fresh exponent in every transfer
+        self.g0_pow = fixed_base(self.g0, self.P).pow
 
     def alice(self, agent: Agent, messages: List[int]):
         assert len(messages) == 2
@@ -43,7 +46,7 @@ class ObliviousTransferProtocol:
         C = [None, None]
         for i in range(2):
             r = csprng.randint(0, self.P - 2)
-            C[i] = (pwr(self.g0, r, self.P), H(pwr(PK[i], r, self.P)) ^ messages[i])
+            C[i] = (self.g0_pow(r), H(pwr(PK[i], r, self.P)) ^ messages[i])
         agent.sender.send(self.bob_id, C[0])
         agent.sender.send(self.bob_id, C[1])
 
@@ -55,8 +58,9 @@ class ObliviousTransferProtocol:
         # B pick k from Z_p, and sends PK0, PK1 to A
         k = csprng.randint(0, self.P - 1)
         PK = [None, None]
-        PK[index] = pwr(self.g0, k, self.P)
-        PK[1 - index] = c * pwr(self.g0, self.P - 1 - k, self.P) % self.P
+        PK[index] = self.g0_pow(k)
+        # c / g0^k, a modular inverse is cheaper than g0^(P - 1 - k)
+        PK[1 - index] = c * pow(PK[index], -1, self.P) % self.P
         agent.sender.send(self.alice_id, PK[0])
         agent.sender.send(self.alice_id, PK[1])
         # B receive C0, C1
@@ -66,3 +70,38 @@ class ObliviousTransferProtocol:
         # B decrypts Cb
         V1, V2 = C[index]
         return H(pwr(V1, k, self.P)) ^ V2
+
+    def alice_batch(self, agent: Agent, message_pairs: List[List[int]]):
+        # n transfers in three messages: all c, all PK pairs, all C pairs
+        cs = [csprng.randint(1, self.P - 1) for _ in message_pairs]
+        agent.sender.send(self.bob_id, cs)
+        _, PKs = agent.receiver.receive()
+        assert len(PKs) == len(message_pairs)
+        Cs = []
+        for c, (PK0, PK1), messages in zip(cs, PKs, message_pairs):
+            assert (PK0 * PK1) % self.P == c
+            C = []
+            for PK, m in [(PK0, messages[0]), (PK1, messages[1])]:
+                r = csprng.randint(0, self.P - 2)
+                C.append((self.g0_pow(r), H(pwr(PK, r, self.P)) ^ m))
+            Cs.append(C)
+        agent.sender.send(self.bob_id, Cs)
+
+    def bob_batch(self, agent: Agent, choices: List[int]) -> List[int]:
+        _, cs = agent.receiver.receive()
+        assert len(cs) == len(choices)
+        ks, PKs = [], []
+        for c, index in zip(cs, choices):
+            assert index in [0, 1]
+            k = csprng.randint(0, self.P - 1)
+            PK = [None, None]
+            PK[index] = self.g0_pow(k)
+            PK[1 - index] = c * pow(PK[index], -1, self.P) % self.P
+            ks.append(k)
+            PKs.append(PK)
+        agent.sender.send(self.alice_id, PKs)
+        _, Cs = agent.receiver.receive()
+        return [
+            H(pwr(C[index][0], k, self.P)) ^ C[index][1]
+            for C, index, k in zip(Cs, choices, ks)
+        ]
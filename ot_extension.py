@@ -0,0 +1,153 @@
+import hashlib
+import csprng
+import numpy as np
+
+from typing import List, Any, Tuple
+from agent import Agent
+from oblivious_transfer import ObliviousTransferProtocol
+
+# IKNP OT extension, semi-honest
+# https://www.iacr.org/archive/crypto2003/27290145/27290145.pdf
+#
+# security_param base OTs with the roles swapped give alice a random string s
+# and one seed of every pair bob holds. Each batch of m transfers then costs bob
+# one message of security_param columns of m bits and alice one message of the
+# masked pairs. The base OTs are run once and every later batch expands the
+# seeds with a new batch counter. The correlated variant only sends one
+# correction per transfer.
+
+
+def _prg(seed: int, batch: int, n_bytes: int) -> np.ndarray:
+    h = hashlib.shake_128(seed.to_bytes(32, 'little') + batch.to_bytes(8, 'little'))
+    return np.frombuffer(h.digest(n_bytes), dtype=np.uint8)
+
+
+def _transpose(columns: np.ndarray, m: int) -> np.ndarray:
+    # security_param columns of m bits to m rows of security_param bits
+    bits = np.unpackbits(columns, axis=1, count=m, bitorder='little')
+    return np.packbits(bits.T, axis=1, bitorder='little')
+
+
+def _hash(row: bytes, j: int, n_bytes: int) -> int:
+    h = hashlib.blake2b(row + j.to_bytes(8, 'little'), digest_size=n_bytes)
+    return int.from_bytes(h.digest(), 'little')
+
+
+class OTExtensionProtocol:
+    alice_id: Any
+    bob_id: Any
+    security_param: int
+    base_OT: ObliviousTransferProtocol
+
+    def __init__(self, OT: ObliviousTransferProtocol, security_param=128) -> None:
+        assert security_param % 8 == 0 and security_param <= 256
+        self.alice_id, self.bob_id = OT.alice_id, OT.bob_id
+        self.security_param = security_param
+        # the base OTs run from bob to alice
+        self.base_OT = ObliviousTransferProtocol(group=(OT.g0, OT.P))
+        self.base_OT.alice_id, self.base_OT.bob_id = OT.bob_id, OT.alice_id
+        # alice keeps s and the seeds she chose, bob both seeds of every base OT,
+        # and both count batches and transfers to keep PRG and hash inputs fresh
+        self.alice_state = None
+        self.bob_state = None
+
+    def alice_rows(self, agent: Agent, m: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        # extends the base OTs to m transfers, row j of the first array is
+        # t_j ^ (choices[j] * s) and of the second that row ^ s. Also returns
+        # the index of the first transfer.
+        k = self.security_param
+        if self.alice_state is None:
+            s = [csprng.randint(0, 1) for _ in range(k)]
+            seeds = self.base_OT.bob_batch(agent, s)
+            s_bytes = np.packbits(np.array(s, dtype=np.uint8), bitorder='little')
+            self.alice_state = [s, s_bytes, seeds, 0, 0]
+        s, s_bytes, seeds, batch, offset = self.alice_state
+
+        m_bytes = (m + 7) // 8
+        _, u = agent.receiver.receive()
+        u = np.frombuffer(u, dtype=np.uint8).reshape(k, m_bytes)
+        q = np.empty((k, m_bytes), dtype=np.uint8)
+        for i in range(k):
+            q[i] = _prg(seeds[i], batch, m_bytes)
+            if s[i]:
+                q[i] ^= u[i]
+        rows = _transpose(q, m)
+        self.alice_state[3:] = [batch + 1, offset + m]
+        return rows, rows ^ s_bytes, offset
+
+    def bob_rows(self, agent: Agent, choices: List[int]) -> Tuple[np.ndarray, int]:
+        # returns the rows t_j and the index of the first transfer
+        k = self.security_param
+        if self.bob_state is None:
+            seeds = [
+                [csprng.randint(0, (1 << k) - 1) for _ in range(2)] for _ in range(k)
+            ]
+            self.base_OT.alice_batch(agent, seeds)
+            self.bob_state = [seeds, 0, 0]
+        seeds, batch, offset = self.bob_state
+
+        m_bytes = (len(choices) + 7) // 8
+        r = np.packbits(np.array(choices, dtype=np.uint8), bitorder='little')
+        t = np.empty((k, m_bytes), dtype=np.uint8)
+        u = np.empty((k, m_bytes), dtype=np.uint8)
+        for i in range(k):
+            t[i] = _prg(seeds[i][0], batch, m_bytes)
+            u[i] = t[i] ^ _prg(seeds[i][1], batch, m_bytes) ^ r
+        agent.sender.send(self.alice_id, u.tobytes())
+        self.bob_state[1:] = [batch + 1, offset + len(choices)]
+        return _transpose(t, len(choices)), offset
+
+    def alice(
+        self,
+        agent: Agent,
+        message_pairs: List[Tuple[int, int]],
+        n_bytes: int = 16,
+    ):
+        # sends message_pairs[j][choices[j]] of n_bytes each to bob
+        rows, rows_s, offset = self.alice_rows(agent, len(message_pairs))
+        ret = bytearray()
+        for j, (x0, x1) in enumerate(message_pairs):
+            h0 = _hash(rows[j].tobytes(), offset + j, n_bytes)
+            h1 = _hash(rows_s[j].tobytes(), offset + j, n_bytes)
+            ret += (x0 ^ h0).to_bytes(n_bytes, 'little')
+            ret += (x1 ^ h1).to_bytes(n_bytes, 'little')
+        agent.sender.send(self.bob_id, bytes(ret))
+
+    def bob(self, agent: Agent, choices: List[int], n_bytes: int = 16) -> List[int]:
+        rows, offset = self.bob_rows(agent, choices)
+        _, y = agent.receiver.receive()
+        ret = []
+        for j, c in enumerate(choices):
+            start = (2 * j + c) * n_bytes
+            y_j = int.from_bytes(y[start : start + n_bytes], 'little')
+            ret.append(y_j ^ _hash(rows[j].tobytes(), offset + j, n_bytes))
+        return ret
+
+    def alice_correlated(
+        self, agent: Agent, Delta: int, m: int, n_bytes: int = 16
+    ) -> List[int]:
+        # correlated OT: returns m random x0 and bob gets x0 ^ (choices[j] * Delta),
+        # a single correction of n_bytes is sent per transfer
+        rows, rows_s, offset = self.alice_rows(agent, m)
+        x0s = []
+        ret = bytearray()
+        for j in range(m):
+            h0 = _hash(rows[j].tobytes(), offset + j, n_bytes)
+            h1 = _hash(rows_s[j].tobytes(), offset + j, n_bytes)
+            x0s.append(h0)
+            ret += (h0 ^ h1 ^ Delta).to_bytes(n_bytes, 'little')
+        agent.sender.send(self.bob_id, bytes(ret))
+        return x0s
+
+    def bob_correlated(
+        self, agent: Agent, choices: List[int], n_bytes: int = 16
+    ) -> List[int]:
+        rows, offset = self.bob_rows(agent, choices)
+        _, y = agent.receiver.receive()
+        ret = []
+        for j, c in enumerate(choices):
+            h = _hash(rows[j].tobytes(), offset + j, n_bytes)
+            if c:
+                h ^= int.from_bytes(y[j * n_bytes : (j + 1) * n_bytes], 'little')
+            ret.append(h)
+        return ret
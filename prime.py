@@ -1,31 +1,145 @@
+from typing import List, Optional, Tuple
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from functools import lru_cache
+import os
 import csprng
 import sympy
 
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
 
 def pwr(x, k, P):
     # compute x^k mod P
-    # kuai su mi
-    ans = 1
-    while k:
-        if k & 1:
-            ans = (ans * x) % P
-        x = (x * x) % P
-        k >>= 1
-    return ans
+    if gmpy2 is not None:
+        return int(gmpy2.powmod(x, k, P))
+    return pow(x, k, P)
 
 
-def gen_prime(n: int):
-    while 1:
-        p = csprng.randint(n, n * 2 - 1)
-        p |= 1
-        if p % 3 != 2:
+class FixedBase:
+    # x^k mod P for a fixed x: row i of the table holds x^(d << (window * i))
+    # for every window-bit digit d, so a power is one product per digit
+    def __init__(self, x: int, P: int, window: Optional[int] = None) -> None:
+        if window is None:
+            window = 6 if P.bit_length() <= 512 else 4
+        mpz = gmpy2.mpz if gmpy2 is not None else int
+        self.x, self.P, self.window = x, P, window
+        self.table = []
+        base = mpz(x) % P
+        for _ in range(-(-P.bit_length() // window)):
+            row = [mpz(1)] * (1 << window)
+            for d in range(1, 1 << window):
+                row[d] = row[d - 1] * base % P
+            self.table.append(row)
+            base = row[-1] * base % P
+
+    def pow(self, k: int) -> int:
+        # k is reduced mod P - 1, which keeps it within the table
+        k %= self.P - 1
+        P, mask = self.P, (1 << self.window) - 1
+        ret = 1
+        for row in self.table:
+            if not k:
+                break
+            if k & mask:
+                ret = ret * row[k & mask] % P
+            k >>= self.window
+        return int(ret)
+
+
+@lru_cache(maxsize=16)
+def fixed_base(x: int, P: int) -> FixedBase:
+    return FixedBase(x, P)
+
+
+def _small_primes(limit: int) -> List[int]:
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for i in range(2, int(limit**0.5) + 1):
+        if sieve[i]:
+            sieve[i * i :: i] = bytes(len(range(i * i, limit, i)))
+    return [i for i in range(limit) if sieve[i]]
+
+
+_SMALL_PRIMES = _small_primes(1 << 16)
+_WINDOW = 1 << 14
+
+
+def _probable_prime(p: int) -> bool:
+    # one Fermat/Miller-Rabin round to base 2, cheap next to sympy.isprime
+    return pow(2, p - 1, p) == 1
+
+
+def _search_window(n: int) -> Optional[Tuple[int, int]]:
+    # sieves a random window of odd candidates p in [n, 2n), striking out every
+    # p for which p or 2p + 1 has a small factor, and tests the survivors
+    window = min(_WINDOW, n // 2)
+    base = csprng.randint(n, 2 * n - 2 * window) | 1
+    sieve = bytearray([1]) * window
+    for r in _SMALL_PRIMES[1:]:
+        if r >= n:
+            break
+        # candidate k is p = base + 2k, p = 0 and 2p + 1 = 0 mod r
+        inv2 = (r + 1) >> 1
+        for residue in [0, (r - 1) >> 1]:
+            start = (residue - base) * inv2 % r
+            sieve[start::r] = bytes(len(range(start, window, r)))
+    for k in range(window):
+        if not sieve[k]:
             continue
-        if sympy.isprime(p) and sympy.isprime(2 * p + 1):
-            return p, 2 * p + 1
+        p = base + 2 * k
+        q = 2 * p + 1
+        if _probable_prime(q) and _probable_prime(p):
+            if sympy.isprime(p) and sympy.isprime(q):
+                return p, q
+    return None
+
+
+def _search_windows(n: int, count: int) -> Optional[Tuple[int, int]]:
+    for _ in range(count):
+        ret = _search_window(n)
+        if ret is not None:
+            return ret
+    return None
+
+
+def gen_prime(
+    n: int, executor: Optional[Executor] = None, n_workers: Optional[int] = None
+):
+    # a safe prime pair (p, 2p + 1) with p in [n, 2n). With executor, a
+    # ProcessPoolExecutor, n_workers searches run at once and the first pair
+    # found wins, searches that have not started yet are cancelled.
+    n = int(n)
+    if n < 16:
+        while 1:
+            p = csprng.randint(n, n * 2 - 1)
+            if sympy.isprime(p) and sympy.isprime(2 * p + 1):
+                return p, 2 * p + 1
+    if executor is None:
+        while 1:
+            ret = _search_window(n)
+            if ret is not None:
+                return ret
+
+    n_workers = n_workers or os.cpu_count()
+    futures = {executor.submit(_search_windows, n, 4) for _ in range(n_workers)}
+    while 1:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            ret = future.result()
+            if ret is not None:
+                for f in futures:
+                    f.cancel()
+                return ret
+            futures.add(executor.submit(_search_windows, n, 4))
 
 
-def gen_g0(n: int):
-    p, q = gen_prime(n)
+def gen_g0(
+    n: int, executor: Optional[Executor] = None, n_workers: Optional[int] = None
+):
+    p, q = gen_prime(n, executor, n_workers)
     while 1:
         g = csprng.randint(2, q - 2)
         if pwr(g, 2, q) != 1 and pwr(g, p, q) != 1:
@@ -1,6 +1,9 @@
 import unittest
-from circuit import Circuit, Wire, AndGate
-from circuit_utils.gates import Not
+import csprng
+from circuit import Circuit, Wire, AndGate, evaluate_gate
+from circuit_utils import int2bits, bits2int
+from circuit_utils.gates import And, Not
+from circuit_utils.modules import Add
 
 
 class CircuitTest(unittest.TestCase):
@@ -38,6 +41,125 @@ class CircuitTest(unittest.TestCase):
             u = circuit.evaluate([x])
             assert x + u[0] == 1
 
+    def test_schedule(self):
+        circuit = Circuit()
+        wires = [Wire() for _ in range(5)]
+        circuit.extend_wires(wires)
+        # gates added out of topological order
+        circuit.add_gate(And(wires[2], wires[3], wires[4]))
+        circuit.add_gate(And(wires[0], wires[1], wires[2]))
+        circuit.inputs = [wires[0], wires[1], wires[3]]
+        circuit.outputs = [wires[2], wires[4]]
+        assert circuit.schedule() == [1, 0]
+        assert circuit.schedule() is circuit.schedule()
+
+        for x in range(2):
+            for y in range(2):
+                for z in range(2):
+                    u, v = circuit.evaluate([x, y, z])
+                    assert u == (x & y) and v == (x & y & z)
+                    assert circuit.freeze().evaluate([x, y, z]) == [u, v]
+
+        w = Wire()
+        circuit.add_wire(w)
+        circuit.add_gate(Not(wires[4], w))
+        assert circuit.schedule() == [1, 0, 2]
+
+    def test_levels(self):
+        circuit = Circuit()
+        wires = [Wire() for _ in range(7)]
+        circuit.extend_wires(wires)
+        circuit.add_gate(And(wires[0], wires[1], wires[4]))
+        circuit.add_gate(And(wires[2], wires[3], wires[5]))
+        circuit.add_gate(And(wires[4], wires[5], wires[6]))
+        circuit.inputs = wires[:4]
+        circuit.outputs = [wires[6]]
+        assert circuit.levels() == [[0, 1], [2]]
+        assert circuit.depth == 2 and circuit.level_widths() == [2, 1]
+
+        bit_length = 16
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        compact = circuit.freeze()
+        assert compact.depth == circuit.depth
+        assert compact.level_widths() == circuit.level_widths()
+        assert sum(compact.level_widths()) == compact.n_gates
+        produced = set(compact.inputs)
+        for level in compact.levels():
+            for i in level:
+                assert compact.gate_in_a[i] in produced
+                assert compact.gate_in_b[i] in produced
+            produced.update(compact.gate_out[i] for i in level)
+
+    def test_freeze(self):
+        bit_length = 64
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        compact = circuit.freeze()
+        assert compact.n_gates == len(circuit.gates)
+        assert compact.n_wires == len(circuit.wires)
+        for _ in range(10):
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            bits = int2bits(x, bit_length) + int2bits(y, bit_length)
+            result = compact.evaluate(bits)
+            assert result == circuit.evaluate(bits)
+            assert bits2int(result) == (x + y) % (1 << bit_length)
+
+    def test_registers(self):
+        bit_length = 64
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        compact = circuit.freeze()
+        n_slots, slot_a, slot_b, slot_out, input_slots, output_slots = (
+            compact.registers()
+        )
+        assert n_slots < compact.n_wires
+        for _ in range(10):
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            bits = int2bits(x, bit_length) + int2bits(y, bit_length)
+            regs = [-1] * n_slots
+            for s, bit in zip(input_slots, bits):
+                regs[s] = bit
+            for t, a, b, c in zip(compact.gate_types, slot_a, slot_b, slot_out):
+                regs[c] = evaluate_gate(t, regs[a], regs[b])
+            assert [regs[s] for s in output_slots] == compact.evaluate(bits)
+
+    def test_evaluate_batch(self):
+        bit_length = 64
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        compact = circuit.freeze()
+        inputs_matrix = []
+        for _ in range(100):
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            inputs_matrix.append(int2bits(x, bit_length) + int2bits(y, bit_length))
+        assert circuit.freeze() is compact
+        results = circuit.evaluate_batch(inputs_matrix)
+        assert results.shape == (100, bit_length)
+        for bits, result in zip(inputs_matrix, results):
+            assert result.tolist() == compact.evaluate(bits)
+        circuit.outputs = adder.out[:1]
+        assert circuit.freeze() is not compact
+
+        not_circuit = Circuit()
+        w1, w2 = Wire(), Wire()
+        not_circuit.extend_wires([w1, w2])
+        not_circuit.add_gate(Not(w1, w2))
+        not_circuit.inputs = [w1]
+        not_circuit.outputs = [w2]
+        assert not_circuit.evaluate_batch([[0], [1]]).tolist() == [[1], [0]]
+
 
 if __name__ == '__main__':
     unittest.main()
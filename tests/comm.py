@@ -1,5 +1,9 @@
 import unittest
+import os
+import tempfile
+import threading
 from comm.multi_threading import SenderThread, ReceiverThread
+from comm import sockets
 
 
 class MailboxTest(unittest.TestCase):
@@ -26,5 +30,64 @@ class MailboxTest(unittest.TestCase):
         assert sender_id == 0 and msg == 2
 
 
+class SocketTest(unittest.TestCase):
+    messages = [
+        None,
+        True,
+        0,
+        -5,
+        1 << 200,
+        -(1 << 70),
+        b'',
+        b'tables',
+        'str',
+        [],
+        [1, 2, 1 << 128],
+        [-1, 0],
+        [[1, 2], (b'a', b'b')],
+        (bytes(1 << 17), 1),
+    ]
+
+    def test_encoding(self):
+        for msg in self.messages:
+            assert sockets.decode(sockets.encode(msg)) == msg
+        assert len(sockets.encode([1 << 127] * 100)) == 9 + 100 * 17
+        with self.assertRaises(TypeError):
+            sockets.encode(1.5)
+
+    def exchange(self, address):
+        server = sockets.listen(address)
+        if not isinstance(address, str):
+            address = server.getsockname()
+        ret = {}
+
+        def bob():
+            ret['bob'] = sockets.accept(1, server)
+
+        thread = threading.Thread(target=bob)
+        thread.start()
+        sender, receiver = sockets.connect(0, address)
+        thread.join()
+        server.close()
+        bob_sender, bob_receiver = ret['bob']
+        for msg in self.messages:
+            sender.send(1, msg)
+        for msg in self.messages:
+            assert bob_receiver.receive() == (0, msg)
+        bob_sender.send(0, 'done')
+        assert receiver.receive() == (1, 'done')
+        sender.close()
+        with self.assertRaises(ConnectionError):
+            bob_receiver.receive()
+        bob_sender.close()
+
+    def test_tcp(self):
+        self.exchange(('127.0.0.1', 0))
+
+    def test_unix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.exchange(os.path.join(directory, 'socket'))
+
+
 if __name__ == '__main__':
     unittest.main()
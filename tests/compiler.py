@@ -4,6 +4,8 @@ import ast
 from concurrent.futures import ThreadPoolExecutor
 from circuit_utils import bits2int, int2bits
 from compiler.main import ASTCompiler
+from circuit import GATE_AND, GATE_OR
+from circuit_utils import and_minimal
 from comm.multi_threading import SenderThread, ReceiverThread
 from agent import Agent
 from garbled_circuit import GarbledCircuitProtocol
@@ -91,6 +93,31 @@ class CompilerTest(unittest.TestCase):
             result = b.result()
             assert bool(result[0]) == (x < y), f'\n{result}\n{x}\n{y}'
 
+    def test_and_minimal(self):
+        bit_length = 64
+        with open('demo/scripts/billionaire.py', 'r') as f:
+            code = f.read()
+        circuit = ASTCompiler().compile(ast.parse(code))
+        compiler = ASTCompiler(and_minimal)
+        minimal = compiler.compile(ast.parse(code))
+        n_and = lambda c: sum(g.type_code in (GATE_AND, GATE_OR) for g in c.gates)
+        assert 2 * n_and(minimal) < n_and(circuit)
+
+        protocol = GarbledCircuitProtocol(minimal, bit_length + 3, bit_length, 0, 1)
+        Alice, Bob = self.setup_agents(protocol)
+        executor = ThreadPoolExecutor(max_workers=2)
+        for _ in range(4):
+            x = random.randint(0, (1 << (bit_length - 1)) - 1)
+            y = random.randint(0, (1 << (bit_length - 1)) - 1) if _ else x
+            flag = random.randint(0, 1)
+            bits = [0, 1] + int2bits(x, bit_length) + [flag] + int2bits(y, bit_length)
+            assert minimal.evaluate(bits) == circuit.evaluate(bits)
+            a = executor.submit(protocol.alice, Alice, bits[: bit_length + 3])
+            b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+            result = b.result()
+            a.result()
+            assert result == [int(x < y), int(flag and x == y)]
+
 
 if __name__ == '__main__':
     unittest.main()
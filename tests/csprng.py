@@ -0,0 +1,29 @@
+import unittest
+
+import csprng
+
+
+class CSPRNGTest(unittest.TestCase):
+    def test_prg(self):
+        a, b = csprng.PRG(bytes(32)), csprng.PRG(bytes(32))
+        for n in [0, 1, 16, 1000, 1 << 17]:
+            x = a.random_bytes(n)
+            assert len(x) == n and x == b.random_bytes(n)
+        assert csprng.PRG(bytes(32)).random_bytes(64) != csprng.PRG().random_bytes(64)
+        assert csprng.random_bytes(32) != csprng.random_bytes(32)
+
+    def test_random_labels(self):
+        for bits in [1, 7, 80, 128]:
+            labels = csprng.random_labels(1000, bits)
+            assert len(labels) == 1000
+            assert all(0 <= label < 1 << bits for label in labels)
+            assert max(labels).bit_length() == bits
+        labels = csprng.random_labels(1000, 128)
+        assert len(set(labels)) == 1000
+        # roughly half of the bits are set
+        ones = sum(bin(label).count('1') for label in labels)
+        assert abs(ones - 64000) < 2000
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import ast
+import random
+import tempfile
+import unittest
+from circuit import Circuit, Wire
+from circuit_utils import int2bits, bits2int
+from circuit_utils.formats import dump_bristol, load_bristol, save_compact, load_compact
+from compiler.main import ASTCompiler
+
+
+class FormatsTest(unittest.TestCase):
+    def compile(self, path):
+        with open(path, 'r') as f:
+            code = f.read()
+        compiler = ASTCompiler()
+        return compiler.compile(ast.parse(code))
+
+    def test_bristol(self):
+        bit_length = 64
+        circuit = self.compile('tests/demos/if_expr.py')
+        # an input wire as output needs an EQW copy
+        circuit.outputs = circuit.outputs + [circuit.inputs[1]]
+        f = io.StringIO()
+        dump_bristol(circuit, f, [2, bit_length, bit_length, 1], [bit_length, 1])
+        f.seek(0)
+        loaded = load_bristol(f)
+
+        for _ in range(10):
+            x = random.randint(0, (1 << bit_length) - 1)
+            y = random.randint(0, (1 << bit_length) - 1)
+            c = random.randint(0, 1)
+            bits = [0, 1] + int2bits(x, bit_length) + int2bits(y, bit_length) + [c]
+            assert loaded.evaluate(bits) == circuit.evaluate(bits)
+
+    def test_bristol_undriven_output(self):
+        circuit = Circuit()
+        w_a, w_b = Wire(), Wire()
+        circuit.extend_wires([w_a, w_b])
+        circuit.inputs = [w_a]
+        circuit.outputs = [w_b]
+        with self.assertRaises(ValueError):
+            dump_bristol(circuit, io.StringIO())
+
+    def test_load_bristol(self):
+        # (a & b, ~a, a) with a MAND, an INV and an EQW
+        text = '3 5\n2 1 1\n1 3\n\n2 1 0 1 2 MAND\n1 1 0 3 INV\n1 1 0 4 EQW\n'
+        circuit = load_bristol(io.StringIO(text))
+        for a in range(2):
+            for b in range(2):
+                assert circuit.evaluate([a, b]) == [a & b, a ^ 1, a]
+
+    def test_compact(self):
+        bit_length = 64
+        circuit = self.compile('tests/demos/a+b.py')
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'a+b.circuit')
+            save_compact(circuit, path)
+            with load_compact(path) as loaded:
+                assert loaded.n_gates == len(circuit.gates)
+                assert loaded.depth == circuit.depth
+                for _ in range(10):
+                    x = random.randint(0, (1 << bit_length) - 1)
+                    y = random.randint(0, (1 << bit_length) - 1)
+                    bits = [0, 1] + int2bits(x, bit_length) + int2bits(y, bit_length)
+                    result = loaded.evaluate(bits)
+                    assert bits2int(result) == (x + y) % (1 << bit_length)
+                    assert loaded.evaluate_batch([bits])[0].tolist() == result
+            assert loaded._buffer is None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,16 +3,21 @@ import time
 import sys
 import random
 import ast
+import os
+import tempfile
+import multiprocessing
 import csprng
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from agent import Agent
-from circuit import AndGate, Circuit, Wire
+from circuit import AndGate, Circuit, Wire, GATE_XOR, GATE_NOT
 from circuit_utils import int2bits, bits2int
+from circuit_utils.gates import And, Not
 from circuit_utils.modules import Add, Subtract
 from oblivious_transfer import ObliviousTransferProtocol
-from garbled_circuit import GarbledCircuitProtocol
+from garbled_circuit import GarbledCircuitProtocol, gate_hash
 from comm.multi_threading import SenderThread, ReceiverThread
+from comm import sockets
 from compiler.main import ASTCompiler
 
 
@@ -73,8 +78,473 @@ class GCTest(unittest.TestCase):
             a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
             b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
             result = b.result()
+            a.result()
             assert bits2int(result) == (x + y) % (1 << bit_length)
 
+    def test_not(self):
+        circuit = Circuit()
+        w_a, w_b, w_c, w_d, w_e = [Wire() for _ in range(5)]
+        circuit.extend_wires([w_a, w_b, w_c, w_d, w_e])
+        circuit.add_gate(Not(w_a, w_c))
+        circuit.add_gate(And(w_c, w_b, w_d))
+        circuit.add_gate(Not(w_d, w_e))
+        circuit.inputs = [w_a, w_b]
+        circuit.outputs = [w_c, w_d, w_e]
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for enable_freeXOR in [True, False]:
+            protocol = GarbledCircuitProtocol(
+                circuit,
+                1,
+                1,
+                0,
+                1,
+                enable_GRR=enable_freeXOR,
+                enable_freeXOR=enable_freeXOR,
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            for x in range(2):
+                for y in range(2):
+                    a = executor.submit(protocol.alice, Alice, [x])
+                    b = executor.submit(protocol.bob, Bob, [y])
+                    result = b.result()
+                    a.result()
+                    assert result == [x ^ 1, (x ^ 1) & y, ((x ^ 1) & y) ^ 1]
+
+    def test_modes(self):
+        bit_length = 16
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for enable_GRR in [True, False]:
+            for enable_freeXOR in [True, False]:
+                protocol = GarbledCircuitProtocol(
+                    circuit,
+                    bit_length,
+                    bit_length,
+                    0,
+                    1,
+                    enable_GRR=enable_GRR,
+                    enable_freeXOR=enable_freeXOR,
+                )
+                Alice, Bob = self.setup_agents(protocol)
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+
+    def test_half_gates(self):
+        bit_length = 16
+        circuit = Circuit()
+        one = Wire()
+        circuit.add_wire(one)
+        subtract = Subtract(circuit, bit_length, one)
+        circuit.inputs = [one] + subtract.in_0 + subtract.in_1
+        circuit.outputs = subtract.out
+
+        protocol = GarbledCircuitProtocol(
+            circuit, bit_length + 1, bit_length, 0, 1, garbling_scheme='half_gates'
+        )
+        Alice, Bob = self.setup_agents(protocol)
+        _, tables, _ = protocol.garble()
+        n_tables = sum(
+            t not in [GATE_XOR, GATE_NOT] for t in protocol.circuit.gate_types
+        )
+        assert len(tables) == n_tables * 2 * protocol.label_bytes
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for _ in range(5):
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            a = executor.submit(protocol.alice, Alice, [1] + int2bits(x, bit_length))
+            b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+            result = b.result()
+            a.result()
+            assert bits2int(result) == (x - y) % (1 << bit_length)
+
+        with self.assertRaises(ValueError):
+            GarbledCircuitProtocol(
+                circuit, 1, 1, 0, 1, enable_freeXOR=False, garbling_scheme='half_gates'
+            )
+
+    def test_streaming(self):
+        bit_length = 16
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for garbling_scheme in ['classic', 'half_gates']:
+            for chunk_size in [1, 7, 1000]:
+                protocol = GarbledCircuitProtocol(
+                    circuit,
+                    bit_length,
+                    bit_length,
+                    0,
+                    1,
+                    garbling_scheme=garbling_scheme,
+                    chunk_size=chunk_size,
+                )
+                Alice, Bob = self.setup_agents(protocol)
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+
+        Delta, wire_labels = protocol.garble_inputs()
+        chunks = list(protocol.garble_tables(Delta, wire_labels, 7))
+        assert all(len(chunk) == 7 * protocol.table_bytes for chunk in chunks[:-1])
+        assert 0 < len(chunks[-1]) <= 7 * protocol.table_bytes
+
+    def test_parallel_garbler(self):
+        bit_length = 16
+        circuit = Circuit()
+        one = Wire()
+        circuit.add_wire(one)
+        subtract = Subtract(circuit, bit_length, one)
+        circuit.inputs = [one] + subtract.in_0 + subtract.in_1
+        circuit.outputs = subtract.out
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for enable_GRR, enable_freeXOR, garbling_scheme in [
+                (True, True, 'classic'),
+                (False, True, 'classic'),
+                (True, False, 'classic'),
+                (False, False, 'classic'),
+                (True, True, 'half_gates'),
+            ]:
+                protocol = GarbledCircuitProtocol(
+                    circuit,
+                    bit_length + 1,
+                    bit_length,
+                    0,
+                    1,
+                    enable_GRR=enable_GRR,
+                    enable_freeXOR=enable_freeXOR,
+                    garbling_scheme=garbling_scheme,
+                )
+                protocol.prg = csprng.PRG(bytes(32))
+                wire_labels, tables, _ = protocol.garble()
+                protocol.prg = csprng.PRG(bytes(32))
+                Delta, parallel_labels = protocol.garble_inputs()
+                parallel_tables = protocol.garble_levels(
+                    Delta, parallel_labels, executor, n_workers=2, min_parallel=1
+                )
+                assert parallel_tables == tables
+                assert parallel_labels == wire_labels
+
+            protocol = GarbledCircuitProtocol(
+                circuit, bit_length + 1, bit_length, 0, 1, executor=executor
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            with ThreadPoolExecutor(max_workers=2) as threads:
+                a = threads.submit(protocol.alice, Alice, [1] + int2bits(x, bit_length))
+                b = threads.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+            assert bits2int(result) == (x - y) % (1 << bit_length)
+
+    def test_parallel_evaluator(self):
+        bit_length = 16
+        circuit = Circuit()
+        one = Wire()
+        circuit.add_wire(one)
+        subtract = Subtract(circuit, bit_length, one)
+        circuit.inputs = [one] + subtract.in_0 + subtract.in_1
+        circuit.outputs = subtract.out
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            protocol = GarbledCircuitProtocol(
+                circuit, bit_length + 1, bit_length, 0, 1, garbling_scheme='half_gates'
+            )
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            input_bits = [1] + int2bits(x, bit_length) + int2bits(y, bit_length)
+            wire_labels, tables, output_table = protocol.garble()
+            inputs_labels = [
+                wire_labels[w][bit]
+                for w, bit in zip(protocol.circuit.inputs, input_bits)
+            ]
+            output_labels = protocol.evaluate_levels(
+                inputs_labels, tables, executor, n_workers=2, min_parallel=1
+            )
+            assert output_labels == protocol.evaluate_tables(inputs_labels, [tables])
+            result = protocol.decode_outputs(output_labels, output_table)
+            assert bits2int(result) == (x - y) % (1 << bit_length)
+            assert len(protocol.level_timings) == protocol.circuit.depth
+            assert sum(n for n, _ in protocol.level_timings) == protocol.n_tables()
+
+            for chunk_size in [None, 5]:
+                protocol = GarbledCircuitProtocol(
+                    circuit,
+                    bit_length + 1,
+                    bit_length,
+                    0,
+                    1,
+                    chunk_size=chunk_size,
+                    executor=executor,
+                )
+                Alice, Bob = self.setup_agents(protocol)
+                with ThreadPoolExecutor(max_workers=2) as threads:
+                    a = threads.submit(
+                        protocol.alice, Alice, [1] + int2bits(x, bit_length)
+                    )
+                    b = threads.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                    result = b.result()
+                    a.result()
+                assert bits2int(result) == (x - y) % (1 << bit_length)
+
+    def test_pregarble(self):
+        bit_length = 16
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for chunk_size in [None, 4]:
+            protocol = GarbledCircuitProtocol(
+                circuit, bit_length, bit_length, 0, 1, chunk_size=chunk_size
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            protocol.pregarble(3)
+            executor.submit(protocol.alice_offline, Alice)
+            assert executor.submit(protocol.bob_offline, Bob).result() == 3
+            with tempfile.TemporaryDirectory() as directory:
+                protocol.pregarble(1)
+                protocol.save_pool(os.path.join(directory, 'pool'))
+                protocol.garbled_pool.clear()
+                protocol.load_pool(os.path.join(directory, 'pool'))
+            # 3 shipped instances, then the unshipped one, then a fresh garbling
+            for _ in range(5):
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+            assert not protocol.shipped_pool and not protocol.received_pool
+            assert not protocol.garbled_pool
+
+    def test_ot_extension(self):
+        bit_length = 64
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        protocol = GarbledCircuitProtocol(
+            circuit, bit_length, bit_length, 0, 1, ot_extension=True
+        )
+        Alice, Bob = self.setup_agents(protocol)
+        executor = ThreadPoolExecutor(max_workers=2)
+        for _ in range(3):
+            x = csprng.randint(0, (1 << bit_length) - 1)
+            y = csprng.randint(0, (1 << bit_length) - 1)
+            a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+            b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+            result = b.result()
+            a.result()
+            assert bits2int(result) == (x + y) % (1 << bit_length)
+
+    def test_correlated_ot(self):
+        bit_length = 32
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for chunk_size in [None, 8]:
+            protocol = GarbledCircuitProtocol(
+                circuit,
+                bit_length,
+                bit_length,
+                0,
+                1,
+                garbling_scheme='half_gates',
+                chunk_size=chunk_size,
+                ot_extension=True,
+                correlated_ot=True,
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            protocol.pregarble(1)
+            executor.submit(protocol.alice_offline, Alice)
+            executor.submit(protocol.bob_offline, Bob).result()
+            protocol.pregarble(1)
+            # shipped, pregarbled and fresh instances
+            for _ in range(3):
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+
+        with self.assertRaises(ValueError):
+            GarbledCircuitProtocol(circuit, 1, 1, 0, 1, correlated_ot=True)
+
+    def test_output_decoding(self):
+        bit_length = 19
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for garbling_scheme in ['classic', 'half_gates']:
+            protocol = GarbledCircuitProtocol(
+                circuit,
+                bit_length,
+                bit_length,
+                0,
+                1,
+                garbling_scheme=garbling_scheme,
+                output_decoding='permute_bits',
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            _, _, output_table = protocol.garble()
+            assert len(output_table) == 3
+            for _ in range(3):
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+
+    def test_labels(self):
+        circuit = Circuit()
+        adder = Add(circuit, 8)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        protocol = GarbledCircuitProtocol(circuit, 8, 8, 0, 1)
+        wire_labels, tables, output_table = protocol.garble()
+        for w in circuit.outputs:
+            for label in wire_labels[w.index]:
+                assert label < 1 << 128
+        assert len(tables) % protocol.label_bytes == 0
+        assert len(output_table) == 8
+        assert gate_hash(16, 0, 1, 2) != gate_hash(16, 4, 1, 2)
+        assert gate_hash(16, 0, 1, 2) < 1 << 128
+
+    def test_derived_labels(self):
+        bit_length = 16
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for kwargs in [
+            {},
+            {'enable_freeXOR': False},
+            {'ot_extension': True, 'correlated_ot': True},
+        ]:
+            protocol = GarbledCircuitProtocol(
+                circuit,
+                bit_length,
+                bit_length,
+                0,
+                1,
+                derive_input_labels=True,
+                **kwargs,
+            )
+            Alice, Bob = self.setup_agents(protocol)
+            wire_labels, _, _ = protocol.garble()
+            inputs = [w.index for w in circuit.inputs]
+            labels = [wire_labels[w] for w in inputs]
+            wire_labels.release()
+            assert [wire_labels[w] for w in inputs] == labels
+            assert all(l0 & 1 != l1 & 1 for l0, l1 in labels)
+
+            protocol.pregarble(2)
+            assert protocol.garbled_pool[0].wire_labels.buffer is None
+            # pregarbled instances, then a fresh garbling
+            for _ in range(3):
+                x = csprng.randint(0, (1 << bit_length) - 1)
+                y = csprng.randint(0, (1 << bit_length) - 1)
+                a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+                b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+                result = b.result()
+                a.result()
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+
+    def test_sockets(self):
+        # alice in a child process, connected over a Unix domain socket
+        bit_length = 32
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+        protocol = GarbledCircuitProtocol(
+            circuit, bit_length, bit_length, 0, 1, ot_extension=True
+        )
+        x = csprng.randint(0, (1 << bit_length) - 1)
+        ys = [csprng.randint(0, (1 << bit_length) - 1) for _ in range(3)]
+
+        def alice(path):
+            Alice = Agent()
+            Alice.id = 0
+            Alice.sender, Alice.receiver = sockets.connect(0, path)
+            for _ in ys:
+                protocol.alice(Alice, int2bits(x, bit_length))
+            Alice.sender.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'socket')
+            server = sockets.listen(path)
+            process = multiprocessing.get_context('fork').Process(
+                target=alice, args=(path,)
+            )
+            process.start()
+            Bob = Agent()
+            Bob.id = 1
+            Bob.sender, Bob.receiver = sockets.accept(1, server)
+            server.close()
+            for y in ys:
+                result = protocol.bob(Bob, int2bits(y, bit_length))
+                assert bits2int(result) == (x + y) % (1 << bit_length)
+            process.join()
+            Bob.sender.close()
+            assert process.exitcode == 0
+
+    def test_frozen(self):
+        bit_length = 64
+        circuit = Circuit()
+        adder = Add(circuit, bit_length)
+        circuit.inputs = adder.in_0 + adder.in_1
+        circuit.outputs = adder.out
+
+        protocol = GarbledCircuitProtocol(
+            circuit.freeze(), bit_length, bit_length, 0, 1
+        )
+        Alice, Bob = self.setup_agents(protocol)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        x = csprng.randint(0, (1 << bit_length) - 1)
+        y = csprng.randint(0, (1 << bit_length) - 1)
+        a = executor.submit(protocol.alice, Alice, int2bits(x, bit_length))
+        b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+        result = b.result()
+        a.result()
+        assert bits2int(result) == (x + y) % (1 << bit_length)
+
     def test_billionaire(self):
         bit_length = 64
         circuit = Circuit()
@@ -94,6 +564,7 @@ class GCTest(unittest.TestCase):
             a = executor.submit(protocol.alice, Alice, [1] + int2bits(x, bit_length))
             b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
             result = b.result()
+            a.result()
             assert bool(result[0]) == (x < y), f'\n{result}\n{x}\n{y}'
 
     def test_large_scale(self):
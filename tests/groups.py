@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+import sympy
+import csprng
+from concurrent.futures import ThreadPoolExecutor
+
+import groups
+from agent import Agent
+from groups import MODP_GROUPS, SAFE_PRIMES, get_group, group_for_security
+from oblivious_transfer import ObliviousTransferProtocol
+from comm.multi_threading import SenderThread, ReceiverThread
+
+
+class GroupsTest(unittest.TestCase):
+    def test_registry(self):
+        for bits, (g, P) in SAFE_PRIMES.items():
+            assert P.bit_length() == bits
+            assert sympy.isprime(P) and sympy.isprime(P // 2)
+            assert pow(g, 2, P) != 1 and pow(g, P // 2, P) != 1
+            assert get_group(bits) == (g, P)
+        for bits in [1536, 2048]:
+            g, P = MODP_GROUPS[bits]
+            assert P.bit_length() == bits
+            assert sympy.isprime(P) and sympy.isprime(P // 2)
+
+        assert group_for_security(112) == MODP_GROUPS[2048]
+        assert group_for_security(128) == MODP_GROUPS[3072]
+        with self.assertRaises(ValueError):
+            group_for_security(256)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'groups.json')
+            g, P = get_group(40, path)
+            assert P.bit_length() == 40 and sympy.isprime(P) and sympy.isprime(P // 2)
+            assert groups.load_cache(path) == {40: (g, P)}
+            groups._generated.clear()
+            assert get_group(40, path) == (g, P)
+
+    def test_ot(self):
+        protocol = ObliviousTransferProtocol(group=MODP_GROUPS[1536])
+        protocol.alice_id = 0
+        protocol.bob_id = 1
+
+        Alice = Agent()
+        Alice.id = protocol.alice_id
+        Alice.sender = SenderThread(Alice.id)
+        Alice.receiver = ReceiverThread(Alice.id)
+
+        Bob = Agent()
+        Bob.id = protocol.bob_id
+        Bob.sender = SenderThread(Bob.id)
+        Bob.receiver = ReceiverThread(Bob.id)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for i in range(4):
+            messages = [csprng.randint(0, 1 << 128), csprng.randint(0, 1 << 128)]
+            index = i & 1
+            a = executor.submit(protocol.alice, Alice, messages)
+            b = executor.submit(protocol.bob, Bob, index)
+            assert b.result() == messages[index]
+            a.result()
+
+
+if __name__ == '__main__':
+    unittest.main()
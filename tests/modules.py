@@ -2,7 +2,10 @@ import csprng
 import unittest
 from circuit import Circuit, Wire
 from circuit_utils import int2bits, bits2int
+from circuit import GATE_XOR, GATE_NOT
 from circuit_utils.modules import HalfAdder, FullAdder, Add, Negate, Subtract
+from circuit_utils import and_minimal
+import circuit_utils.modules as circuit_utils_modules
 
 
 class ModulesTest(unittest.TestCase):
@@ -74,5 +77,81 @@ class ModulesTest(unittest.TestCase):
             assert (bits2int(result) - x + y) % (1 << bit_length) == 0
 
 
+def n_non_free(circuit: Circuit) -> int:
+    return sum(g.type_code not in (GATE_XOR, GATE_NOT) for g in circuit.gates)
+
+
+def to_signed(x: int, bit_length: int) -> int:
+    return x - (1 << bit_length) if x >> (bit_length - 1) else x
+
+
+class AndMinimalModulesTest(unittest.TestCase):
+    def test_select(self):
+        circuit = Circuit()
+        select = and_minimal.Select(circuit)
+        circuit.inputs = [select.in_0, select.in_1, select.index]
+        circuit.outputs = [select.out]
+        assert n_non_free(circuit) == 1
+        for x in range(2):
+            for y in range(2):
+                for z in range(2):
+                    assert circuit.evaluate([x, y, z]) == [y if z else x]
+
+    def test_full_adder(self):
+        circuit = Circuit()
+        adder = and_minimal.FullAdder(circuit)
+        circuit.inputs = [adder.in_0, adder.in_1, adder.in_carry]
+        circuit.outputs = [adder.out, adder.carry]
+        assert n_non_free(circuit) == 1
+        for x in range(2):
+            for y in range(2):
+                for z in range(2):
+                    u, v = circuit.evaluate([x, y, z])
+                    assert u == (x + y + z) % 2 and v == int(x + y + z > 1)
+
+    def test_arithmetic(self):
+        bit_length = 16
+        circuit = Circuit()
+        one = Wire()
+        circuit.add_wire(one)
+        in_0 = [Wire() for _ in range(bit_length)]
+        in_1 = [Wire() for _ in range(bit_length)]
+        circuit.extend_wires(in_0 + in_1)
+        add = and_minimal.Add(circuit, bit_length, in_0, in_1)
+        neg = and_minimal.Negate(circuit, bit_length, one, in_0)
+        sub = and_minimal.Subtract(circuit, bit_length, one, in_0, in_1)
+        lt = and_minimal.Lt(circuit, bit_length, one, in_0, in_1)
+        le = and_minimal.Le(circuit, bit_length, one, in_0, in_1)
+        eq = and_minimal.Eq(circuit, bit_length, one, in_0, in_1)
+        circuit.inputs = [one] + in_0 + in_1
+        circuit.outputs = add.out + neg.out + sub.out + lt.out + le.out + eq.out
+        mask = (1 << bit_length) - 1
+        for _ in range(50):
+            x = csprng.randint(0, mask)
+            y = csprng.randint(0, mask) if _ % 5 else x
+            result = circuit.evaluate(
+                [1] + int2bits(x, bit_length) + int2bits(y, bit_length)
+            )
+            n = bit_length
+            assert bits2int(result[:n]) == (x + y) & mask
+            assert bits2int(result[n : 2 * n]) == -x & mask
+            assert bits2int(result[2 * n : 3 * n]) == (x - y) & mask
+            sx, sy = to_signed(x, n), to_signed(y, n)
+            assert result[3 * n :] == [int(sx < sy), int(sx <= sy), int(x == y)]
+
+    def test_non_xor_count(self):
+        bit_length = 64
+        counts = []
+        for modules in [circuit_utils_modules, and_minimal]:
+            circuit = Circuit()
+            one = Wire()
+            circuit.add_wire(one)
+            modules.Add(circuit, bit_length)
+            modules.Lt(circuit, bit_length, one)
+            modules.Eq(circuit, bit_length, one)
+            counts.append(n_non_free(circuit))
+        assert counts[1] * 2 < counts[0], counts
+
+
 if __name__ == '__main__':
     unittest.main()
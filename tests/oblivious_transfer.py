@@ -34,6 +34,34 @@ class OTTest(unittest.TestCase):
             result = b.result()
             assert result == messages[index]
 
+    def test_batch(self):
+        protocol = ObliviousTransferProtocol()
+        protocol.alice_id = 0
+        protocol.bob_id = 1
+
+        Alice = Agent()
+        Alice.id = protocol.alice_id
+        Alice.sender = SenderThread(Alice.id)
+        Alice.receiver = ReceiverThread(Alice.id)
+
+        Bob = Agent()
+        Bob.id = protocol.bob_id
+        Bob.sender = SenderThread(Bob.id)
+        Bob.receiver = ReceiverThread(Bob.id)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        for n in [0, 1, 100]:
+            message_pairs = [
+                [csprng.randint(0, 1 << 128), csprng.randint(0, 1 << 128)]
+                for _ in range(n)
+            ]
+            choices = [csprng.randint(0, 1) for _ in range(n)]
+            a = executor.submit(protocol.alice_batch, Alice, message_pairs)
+            b = executor.submit(protocol.bob_batch, Bob, choices)
+            result = b.result()
+            a.result()
+            assert result == [pair[c] for pair, c in zip(message_pairs, choices)]
+
 
 if __name__ == '__main__':
     unittest.main()
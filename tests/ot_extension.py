@@ -0,0 +1,47 @@
+import unittest
+import csprng
+from concurrent.futures import ThreadPoolExecutor
+
+from agent import Agent
+from oblivious_transfer import ObliviousTransferProtocol
+from ot_extension import OTExtensionProtocol
+from comm.multi_threading import SenderThread, ReceiverThread
+
+
+class OTExtensionTest(unittest.TestCase):
+    def test_1(self):
+        OT = ObliviousTransferProtocol(1 << 129)
+        OT.alice_id = 0
+        OT.bob_id = 1
+        protocol = OTExtensionProtocol(OT)
+
+        Alice = Agent()
+        Alice.id = protocol.alice_id
+        Alice.sender = SenderThread(Alice.id)
+        Alice.receiver = ReceiverThread(Alice.id)
+
+        Bob = Agent()
+        Bob.id = protocol.bob_id
+        Bob.sender = SenderThread(Bob.id)
+        Bob.receiver = ReceiverThread(Bob.id)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        # the first batch runs the base OTs, the later ones reuse them
+        for m, n_bytes in [(1000, 16), (13, 16), (1, 4), (300, 32)]:
+            message_pairs = [
+                (
+                    csprng.randint(0, (1 << 8 * n_bytes) - 1),
+                    csprng.randint(0, (1 << 8 * n_bytes) - 1),
+                )
+                for _ in range(m)
+            ]
+            choices = [csprng.randint(0, 1) for _ in range(m)]
+            a = executor.submit(protocol.alice, Alice, message_pairs, n_bytes)
+            b = executor.submit(protocol.bob, Bob, choices, n_bytes)
+            result = b.result()
+            a.result()
+            assert result == [pair[c] for pair, c in zip(message_pairs, choices)]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import ast
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from circuit import Circuit, Wire, GATE_XOR
+from circuit_utils import int2bits
+from circuit_utils.gates import And, Not, Xor
+from circuit_utils.passes import optimize
+from compiler.main import ASTCompiler
+from garbled_circuit import GarbledCircuitProtocol
+import tests.garbled_circuit as gc_tests
+
+
+def n_non_xor(circuit):
+    return sum(t != GATE_XOR for t in circuit.gate_types)
+
+
+class PassesTest(unittest.TestCase):
+    def test_small(self):
+        circuit = Circuit()
+        wires = [Wire() for _ in range(9)]
+        circuit.extend_wires(wires)
+        one, a, b = wires[:3]
+        circuit.add_gate(And(a, b, wires[3]))
+        circuit.add_gate(And(b, a, wires[4]))  # duplicate of wires[3]
+        circuit.add_gate(Xor(wires[4], one, wires[5]))  # negation
+        circuit.add_gate(Not(wires[5], wires[6]))  # double negation
+        circuit.add_gate(And(one, one, wires[7]))  # constant
+        circuit.add_gate(Xor(a, b, wires[8]))  # dead
+        circuit.inputs = [one, a, b]
+        circuit.outputs = [wires[6], wires[7]]
+
+        optimized = optimize(circuit, {one.index: 1})
+        assert optimized.n_gates == 1
+        for x in range(2):
+            for y in range(2):
+                assert optimized.evaluate([1, x, y]) == [x & y, 1]
+
+    def test_billionaire(self):
+        bit_length = 64
+        with open('tests/demos/billionaire.py', 'r') as f:
+            code = f.read()
+        compiler = ASTCompiler()
+        circuit = compiler.compile(ast.parse(code))
+        optimized = optimize(circuit, compiler.constant_wires())
+        assert n_non_xor(optimized) < n_non_xor(circuit.freeze())
+
+        for _ in range(10):
+            x = random.randint(0, (1 << (bit_length - 1)) - 1)
+            y = random.randint(0, (1 << (bit_length - 1)) - 1)
+            bits = [0, 1] + int2bits(x, bit_length) + int2bits(y, bit_length)
+            assert optimized.evaluate(bits) == circuit.evaluate(bits)
+
+        protocol = GarbledCircuitProtocol(optimized, bit_length + 2, bit_length, 0, 1)
+        Alice, Bob = gc_tests.GCTest.setup_agents(self, protocol)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        x = random.randint(0, (1 << (bit_length - 1)) - 1)
+        y = random.randint(0, (1 << (bit_length - 1)) - 1)
+        a = executor.submit(protocol.alice, Alice, [0, 1] + int2bits(x, bit_length))
+        b = executor.submit(protocol.bob, Bob, int2bits(y, bit_length))
+        result = b.result()
+        a.result()
+        assert bool(result[0]) == (x < y)
+
+
+if __name__ == '__main__':
+    unittest.main()
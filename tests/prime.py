@@ -1,5 +1,9 @@
 import unittest
-from prime import gen_prime, pwr, gen_g0
+import sympy
+from concurrent.futures import ProcessPoolExecutor
+import csprng
+from prime import FixedBase, gen_prime, pwr, gen_g0
+from groups import MODP_GROUPS, get_group
 
 
 class primeTest(unittest.TestCase):
@@ -9,6 +13,26 @@ class primeTest(unittest.TestCase):
             for i in range(1, q - 1):
                 assert pwr(g, i, q) != 1
 
+    def test_gen_prime(self):
+        for n in [20, 1000, 2**64, 2**200]:
+            p, q = gen_prime(n)
+            assert n <= p < 2 * n and q == 2 * p + 1
+            assert sympy.isprime(p) and sympy.isprime(q)
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            p, q = gen_prime(2**256, executor, 2)
+            assert 2**256 <= p < 2**257 and q == 2 * p + 1
+            assert sympy.isprime(p) and sympy.isprime(q)
+
+    def test_fixed_base(self):
+        for g, P in [gen_g0(10000), get_group(131), MODP_GROUPS[1536]]:
+            for window in [None, 1, 5]:
+                table = FixedBase(g, P, window)
+                for k in [0, 1, P - 2, P - 1, P, 3 * P] + [
+                    csprng.randint(0, P) for _ in range(20)
+                ]:
+                    assert table.pow(k) == pow(g, k, P) == pwr(g, k, P)
+
     def test_efficiency(self):
         import time
 